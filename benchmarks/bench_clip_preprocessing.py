@@ -0,0 +1,71 @@
+"""Compare the image processor and the native clip preprocessing on one clip
+
+Run from the repository root:
+    python -m benchmarks.bench_clip_preprocessing --repeats 20
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+from transformers import AutoProcessor
+
+from tools.clip_preprocessing import ClipPreprocessor
+
+
+def make_clip(size=320, frames=16, seed=0):
+    # Attention crops are up to size x size, smaller where clipped at the border.
+    # Smooth random images, pure noise would exaggerate filter differences
+    rng = np.random.default_rng(seed)
+    return [
+        cv2.resize(
+            rng.integers(0, 256, (16, 16, 3), dtype=np.uint8),
+            (size - 7 * i, size),
+            interpolation=cv2.INTER_CUBIC,
+        )
+        for i in range(frames)
+    ]
+
+
+def bench(transform, clip, repeats):
+    transform(clip)  # Warm up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        transform(clip)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="models/VideoMAE")
+    parser.add_argument("--size", type=int, default=320)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    image_processor = AutoProcessor.from_pretrained(args.model)
+    native = ClipPreprocessor.from_image_processor(image_processor)
+    if native is None:
+        print("The processor settings are not supported by the native path")
+        return
+
+    def processor(frames):
+        return image_processor(frames, return_tensors="np")["pixel_values"][0]
+
+    clip = make_clip(args.size)
+    expected = processor(clip)
+    actual = native(clip)
+    diff = np.abs(expected - actual)
+    print(
+        f"output {actual.shape}, max abs diff {diff.max():.4f}, mean {diff.mean():.4f}"
+    )
+
+    processor_ms = bench(processor, clip, args.repeats)
+    native_ms = bench(native, clip, args.repeats)
+    print(f"{'path':>9}  {'ms/clip':>8}  {'speedup':>7}")
+    print(f"{'processor':>9}  {processor_ms:>8.2f}  {1:>6.2f}x")
+    print(f"{'native':>9}  {native_ms:>8.2f}  {processor_ms / native_ms:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Measure detection fps for several detection strides
+
+Run from the repository root on a recording with people in it:
+    python -m benchmarks.bench_detection_stride video.mp4 --strides 1 2 3 5 10
+"""
+
+import argparse
+import time
+
+from tools.frame_sampler import FrameSampler
+
+
+def make_processor(path, stride, args):
+    if path == "camera":
+        from tools.camera_streaming_preprocessing import CameraStreamingPreprocessing
+
+        processor = CameraStreamingPreprocessing(
+            frame_size=(args.width, args.height),
+            fps=args.fps,
+            yolo_path=args.yolo,
+            motion_gate=args.motion_gate,
+            detection_stride=stride,
+        )
+        return processor, processor.process
+
+    from tools.video_preprocessing import VideoPreprocessing
+
+    processor = VideoPreprocessing(
+        video_path=args.video_path,
+        frame_size=(args.width, args.height),
+        fps=args.fps,
+        yolo_path=args.yolo,
+        motion_gate=args.motion_gate,
+        detection_stride=stride,
+    )
+    return processor, processor.process
+
+
+def bench(process, frames):
+    start = time.perf_counter()
+    for frame in frames:
+        process(frame)
+    return len(frames) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("video_path")
+    parser.add_argument("--strides", type=int, nargs="+", default=[1, 2, 3, 5, 10])
+    parser.add_argument("--path", choices=["video", "camera"], default="video")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--yolo", default="models/yolo11s-pose.pt")
+    parser.add_argument(
+        "--motion-gate", action="store_true", help="Also skip unchanged frames"
+    )
+    args = parser.parse_args()
+
+    # Decode once up front so only detection and propagation are timed
+    frames = []
+    for _, _, frame in FrameSampler(args.video_path, args.fps):
+        frames.append(frame)
+        if len(frames) >= args.frames:
+            break
+
+    print(f"{args.path} path, {len(frames)} frames")
+    print(f"{'stride':>6}  {'fps':>8}  {'speedup':>7}  {'yolo runs':>9}")
+    baseline = None
+    for stride in args.strides:
+        processor, process = make_processor(args.path, stride, args)
+        process(frames[0])  # Load the model outside the timing
+        processor.keyframe_detector.reset()
+
+        rate = bench(process, frames)
+        baseline = baseline or rate
+        print(
+            f"{stride:>6}  {rate:>8.2f}  {rate / baseline:>6.2f}x  "
+            f"{processor.keyframe_detector.detected:>9}"
+        )
+        if hasattr(processor, "cleanup"):
+            processor.cleanup()
+
+
+if __name__ == "__main__":
+    main()
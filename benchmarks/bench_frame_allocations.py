@@ -0,0 +1,123 @@
+"""Measure how much memory the per-frame loop allocates, using tracemalloc
+
+Frames go one at a time through the same steps the video pipeline and the
+live camera run, and the peak of newly allocated memory is recorded for
+every frame. YOLO's own allocations are left out unless --with-detection.
+
+Run from the repository root, once per commit to compare:
+    python -m benchmarks.bench_frame_allocations video.mp4 --frames 200
+"""
+
+import argparse
+import statistics
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from tools.detection import detection_dtype
+from tools.frame_sampler import FrameSampler
+
+
+def video_step(processor, videomae):
+    """One frame through prepare, detect, crop and output like iter_video"""
+    pool = getattr(processor, "frame_pool", None)
+
+    def step(frame):
+        resized_frame, origin_frame, detector_frame = processor.prepare(frame)
+        boxes = processor.gated_detect(detector_frame)
+        selected_group = processor.select_group(boxes)
+        processed_frame, attention_frame = processor.annotate_frame(
+            resized_frame, origin_frame, boxes, selected_group
+        )
+        if attention_frame is not None:
+            videomae.crop_frame(attention_frame)
+        output = cv2.resize(processed_frame, (frame.shape[1], frame.shape[0]))
+        if pool is not None:
+            pool.release(processed_frame, origin_frame)
+        return output
+
+    return step
+
+
+def measure(step, frames):
+    """Peak bytes allocated while handling each frame"""
+    peaks = []
+    tracemalloc.start()
+    for frame in frames:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        output = step(frame)
+        _, peak = tracemalloc.get_traced_memory()
+        del output
+        peaks.append(peak - before)
+    tracemalloc.stop()
+    return peaks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("video_path")
+    parser.add_argument("--path", choices=["video", "camera"], default="video")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--yolo", default="models/yolo11s-pose.pt")
+    parser.add_argument("--videomae", default="models/VideoMAE")
+    parser.add_argument(
+        "--with-detection", action="store_true", help="Count YOLO's allocations too"
+    )
+    args = parser.parse_args()
+
+    # Decode up front, as the camera hands out ready frames
+    frames = []
+    for _, _, frame in FrameSampler(args.video_path, args.fps):
+        frames.append(frame)
+        if len(frames) >= args.frames:
+            break
+
+    from tools.model_registry import models
+
+    videomae = models.get("videomae", args.videomae)
+    if args.path == "camera":
+        from tools.camera_streaming_preprocessing import CameraStreamingPreprocessing
+
+        processor = CameraStreamingPreprocessing(
+            frame_size=(args.width, args.height), fps=args.fps, yolo_path=args.yolo
+        )
+        step = processor.update
+    else:
+        from tools.video_preprocessing import VideoPreprocessing
+
+        processor = VideoPreprocessing(
+            video_path=args.video_path,
+            frame_size=(args.width, args.height),
+            fps=args.fps,
+            yolo_path=args.yolo,
+            videomae_path=args.videomae,
+            videomae=videomae,
+        )
+        step = video_step(processor, videomae)
+
+    if not args.with_detection:
+        empty = np.zeros(0, dtype=detection_dtype())
+        processor.keyframe_detector.detect = lambda frame: empty
+
+    step(frames[0])  # Load models and fill buffer pools outside the count
+    peaks = measure(step, frames[1:])
+    frame_bytes = args.width * args.height * 3
+    mean = statistics.mean(peaks)
+    print(f"{args.path} path, {len(peaks)} frames of {args.width}x{args.height}")
+    print(
+        f"peak allocated per frame: mean {mean / 2**20:.2f} MB, "
+        f"max {max(peaks) / 2**20:.2f} MB"
+    )
+    print(f"that is {mean / frame_bytes:.2f} frame_size frames per frame")
+
+    if hasattr(processor, "cleanup"):
+        processor.cleanup()
+
+
+if __name__ == "__main__":
+    main()
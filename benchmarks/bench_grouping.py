@@ -0,0 +1,84 @@
+"""Measure people grouping time as the number of detections grows
+
+Run from the repository root:
+    python -m benchmarks.bench_grouping --counts 4 16 50 100 200 500
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from tools.grouping import group_people
+
+
+def scan_group_people(centers, threshold=200):
+    """The original pairwise scan, kept as the reference to compare against"""
+
+    def euclidean_distance(point1, point2):
+        return np.sqrt((point1[0] - point2[0]) ** 2 + (point1[1] - point2[1]) ** 2)
+
+    n = len(centers)
+    groups = []
+    visited = [False] * n
+
+    for i in range(n):
+        if visited[i]:
+            continue
+
+        group = [i]
+        visited[i] = True
+
+        for j in range(i + 1, n):
+            if visited[j]:
+                continue
+
+            if any(
+                euclidean_distance(centers[k], centers[j]) < threshold for k in group
+            ):
+                group.append(j)
+                visited[j] = True
+
+        groups.append(group)
+
+    return groups
+
+
+def make_centers(count, frame_size=(1920, 1080), seed=0):
+    """Person centers bunched around a few spots, like a platform crowd"""
+    rng = np.random.default_rng(seed)
+    spots = rng.uniform((0, 0), frame_size, (max(1, count // 10), 2))
+    centers = spots[rng.integers(0, len(spots), count)]
+    centers += rng.normal(0, 120, (count, 2))
+    centers = np.clip(centers, 0, np.array(frame_size) - 1).astype(int)
+    return [tuple(center) for center in centers.tolist()]
+
+
+def bench(fn, centers, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        groups = fn(centers)
+    return (time.perf_counter() - start) / repeat, groups
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--counts", type=int, nargs="+", default=[4, 16, 50, 100, 200, 500]
+    )
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'people':>6}  {'scan ms':>8}  {'grid ms':>8}  {'speedup':>7}  same")
+    for count in args.counts:
+        centers = make_centers(count)
+        scan_time, scan_groups = bench(scan_group_people, centers, args.repeat)
+        grid_time, grid_groups = bench(group_people, centers, args.repeat)
+        print(
+            f"{count:>6}  {scan_time * 1000:>8.2f}  {grid_time * 1000:>8.2f}  "
+            f"{scan_time / grid_time:>6.1f}x  {scan_groups == grid_groups}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Measure cold start time from launching the app to its first paint
+
+The app runs against a temporary workspace, so benchmarking never writes
+into the repository. The exit status is 1 when startup is over budget or
+pulled in a heavy module before the window showed.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup --runs 5 --budget 3.0
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from tools.model_registry import HEAVY_MODULES
+
+# Runs in a fresh interpreter, prints the heavy modules loaded at first paint
+CHILD = """
+import os
+import sys
+
+from PyQt5 import QtCore
+from PyQt5.QtWidgets import QApplication
+
+HEAVY_MODULES = {heavy!r}
+
+
+class FirstPaint(QtCore.QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QtCore.QEvent.Paint:
+            loaded = [module for module in HEAVY_MODULES if module in sys.modules]
+            print("painted", *loaded, flush=True)
+            os._exit(0)
+        return False
+
+
+app = QApplication(sys.argv)
+first_paint = FirstPaint()
+app.installEventFilter(first_paint)
+
+import main
+
+window = main.MainWindow(workspace_path={workspace!r})
+app.exec_()
+"""
+
+
+def measure(timeout, workspace):
+    """Seconds until the first paint and the heavy modules loaded by then"""
+    child = CHILD.format(heavy=HEAVY_MODULES, workspace=workspace)
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", child],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        line = process.stdout.readline()
+        elapsed = time.perf_counter() - start
+        process.wait(timeout=timeout)
+    finally:
+        if process.poll() is None:
+            process.kill()
+    if not line.startswith("painted"):
+        raise RuntimeError("The app exited before painting its window")
+    return elapsed, line.split()[1:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--budget", type=float, default=3.0, help="Seconds allowed to first paint"
+    )
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    os.environ.setdefault("PYTHONDONTWRITEBYTECODE", "1")
+    print(f"{'run':>3}  {'first paint':>11}  heavy modules loaded")
+    times = []
+    heavy = set()
+    for run in range(1, args.runs + 1):
+        with tempfile.TemporaryDirectory() as workspace:
+            elapsed, loaded = measure(args.timeout, workspace)
+        times.append(elapsed)
+        heavy.update(loaded)
+        print(f"{run:>3}  {elapsed:>10.2f}s  {', '.join(loaded) or '-'}")
+
+    median = statistics.median(times)
+    print(f"median {median:.2f}s, budget {args.budget:.2f}s")
+
+    failed = False
+    if median > args.budget:
+        print("FAIL: startup is over budget")
+        failed = True
+    if heavy:
+        print(f"FAIL: {', '.join(sorted(heavy))} imported before the first paint")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Measure VideoMAE throughput in clips/second for several batch sizes
+
+Run from the repository root:
+    python -m benchmarks.bench_videomae_batch --batch-sizes 1 2 4 8
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from tools.run_VideoMAEmodel import RunVideoMAEmodel
+
+
+def make_clips(count, size=320, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        [rng.integers(0, 256, (size, size, 3), dtype=np.uint8) for _ in range(16)]
+        for _ in range(count)
+    ]
+
+
+def bench(videomae, batch_size, clips, warmup=1):
+    batches = [clips[i : i + batch_size] for i in range(0, len(clips), batch_size)]
+    for batch in batches[:warmup]:
+        videomae.classify(batch)
+
+    start = time.perf_counter()
+    for batch in batches:
+        videomae.classify(batch)
+    elapsed = time.perf_counter() - start
+    return len(clips) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="models/VideoMAE")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--clips", type=int, default=32)
+    args = parser.parse_args()
+
+    videomae = RunVideoMAEmodel(args.model)
+    clips = make_clips(args.clips)
+
+    print(f"device: {videomae.device}, clips per run: {len(clips)}")
+    print(f"{'batch':>5}  {'clips/s':>8}  {'speedup':>7}")
+    baseline = None
+    for batch_size in args.batch_sizes:
+        rate = bench(videomae, batch_size, clips)
+        baseline = baseline or rate
+        print(f"{batch_size:>5}  {rate:>8.2f}  {rate / baseline:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Compare VideoMAE engines on clips/second and peak memory (RSS)
+
+Every engine runs in a fresh process, so its peak RSS covers only its own
+imports, model and inference buffers. The first ONNX or INT8 run also
+exports or quantizes the model into the cache, which shows up in its load
+time. Run twice to see the cached load.
+
+Run from the repository root:
+    python -m benchmarks.bench_videomae_engines --engines torch onnx
+"""
+
+import argparse
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from tools.model_registry import VIDEOMAE_KINDS
+
+
+def rss_mb():
+    """(current, peak) resident memory of this process in MB"""
+    import psutil
+
+    memory = psutil.Process().memory_info()
+    try:
+        import resource
+    except ImportError:
+        # Windows tracks the peak working set itself
+        return memory.rss / 2**20, memory.peak_wset / 2**20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    peak = peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+    return memory.rss / 2**20, peak
+
+
+def bench_engine(engine, model_path, batch_size, clips, threads):
+    """Runs in its own process: load one engine and classify random crops"""
+    import torch
+
+    from tools.model_registry import load_videomae
+
+    if threads:
+        torch.set_num_threads(threads)
+
+    start = time.perf_counter()
+    videomae = load_videomae(model_path, engine)
+    load_time = time.perf_counter() - start
+    loaded_rss, _ = rss_mb()
+
+    rng = np.random.default_rng(0)
+    shape = (videomae.config.num_frames,) + videomae.crop_shape
+    crops = [rng.integers(0, 256, shape, dtype=np.uint8) for _ in range(clips)]
+    batches = [crops[i : i + batch_size] for i in range(0, clips, batch_size)]
+    videomae.classify_crops(batches[0])  # Warm up
+
+    start = time.perf_counter()
+    for batch in batches:
+        videomae.classify_crops(batch)
+    rate = clips / (time.perf_counter() - start)
+    _, peak_rss = rss_mb()
+    return load_time, rate, loaded_rss, peak_rss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="models/VideoMAE")
+    parser.add_argument(
+        "--engines", nargs="+", choices=list(VIDEOMAE_KINDS), default=["torch", "onnx"]
+    )
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--clips", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=None, help="Torch threads")
+    args = parser.parse_args()
+
+    print(f"clips per run: {args.clips}, batch size: {args.batch_size}")
+    print(
+        f"{'engine':>6}  {'load s':>6}  {'clips/s':>8}  {'speedup':>7}  "
+        f"{'RSS MB':>7}  {'peak MB':>7}"
+    )
+    # Spawn gives every engine a clean process without the others' imports
+    context = multiprocessing.get_context("spawn")
+    baseline = None
+    for engine in args.engines:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            load_time, rate, loaded_rss, peak_rss = pool.submit(
+                bench_engine,
+                engine,
+                args.model,
+                args.batch_size,
+                args.clips,
+                args.threads,
+            ).result()
+        baseline = baseline or rate
+        print(
+            f"{engine:>6}  {load_time:>6.1f}  {rate:>8.2f}  {rate / baseline:>6.2f}x  "
+            f"{loaded_rss:>7.0f}  {peak_rss:>7.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
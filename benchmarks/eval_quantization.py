@@ -0,0 +1,132 @@
+"""Compare the INT8 quantized VideoMAE against fp32 on a set of validation clips
+
+Clips of 16 frames are cut from every video under a folder and go through
+both models the way the app feeds them. Reports how often the two agree,
+how far their logits drift and how much faster INT8 runs on the CPU. When
+videos sit in folders named after a class (for example val/fall/clip.mp4),
+the top-1 accuracy of both models and its delta are reported too.
+
+Run from the repository root:
+    python -m benchmarks.eval_quantization data/val --clips-per-video 4
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import torch
+
+from tools.batch_processing import VIDEO_EXTENSIONS
+from tools.frame_sampler import FrameSampler
+from tools.run_VideoMAEmodel import RunVideoMAEmodel
+
+
+def list_videos(folder):
+    videos = []
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(VIDEO_EXTENSIONS):
+                videos.append(os.path.join(root, name))
+    return videos
+
+
+def load_clips(videomae, videos, fps, clips_per_video, num_frames=16):
+    """(clip, video path) pairs of frames already cut with crop_frame"""
+    clips = []
+    for video_path in videos:
+        frames = []
+        count = 0
+        sampler = FrameSampler(video_path, fps)
+        for _, _, frame in sampler:
+            frames.append(videomae.crop_frame(frame))
+            if len(frames) == num_frames:
+                clips.append((np.stack(frames), video_path))
+                frames = []
+                count += 1
+                if count >= clips_per_video:
+                    break
+        sampler.release()
+    return clips
+
+
+def classify(videomae, clips):
+    """Labels, logits and seconds per clip, one clip at a time like the camera"""
+    labels, logits = [], []
+    start = time.perf_counter()
+    for clip, _ in clips:
+        predicted, clip_logits = videomae.classify_crops([clip])
+        labels.append(predicted[0])
+        logits.append(clip_logits[0].float().cpu().numpy())
+    elapsed = time.perf_counter() - start
+    return labels, np.stack(logits), elapsed / len(clips)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("folder", help="Folder of validation videos")
+    parser.add_argument("--model", default="models/VideoMAE")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--clips-per-video", type=int, default=4)
+    parser.add_argument("--cache-dir", default=None, help="Quantized model cache")
+    args = parser.parse_args()
+
+    videos = list_videos(args.folder)
+    if not videos:
+        parser.error(f"No videos found in {args.folder}")
+
+    start = time.perf_counter()
+    fp32 = RunVideoMAEmodel(args.model)
+    fp32_load = time.perf_counter() - start
+    fp32.device = torch.device("cpu")  # Compare both on the CPU
+    fp32.VideoMAE_model = fp32.VideoMAE_model.to(fp32.device)
+    start = time.perf_counter()
+    int8 = RunVideoMAEmodel(args.model, quantize=True, cache_dir=args.cache_dir)
+    int8_load = time.perf_counter() - start
+
+    clips = load_clips(fp32, videos, args.fps, args.clips_per_video)
+    if not clips:
+        parser.error("No video is long enough for a single clip")
+
+    # Run once each outside the timing
+    fp32.classify_crops([clips[0][0]])
+    int8.classify_crops([clips[0][0]])
+    fp32_labels, fp32_logits, fp32_time = classify(fp32, clips)
+    int8_labels, int8_logits, int8_time = classify(int8, clips)
+
+    agreement = np.mean([a == b for a, b in zip(fp32_labels, int8_labels)])
+    logit_delta = np.abs(fp32_logits - int8_logits)
+    print(
+        f"{len(clips)} clips from {len(videos)} videos, torch threads: "
+        f"{torch.get_num_threads()}"
+    )
+    print(f"load time: fp32 {fp32_load:.1f}s, int8 {int8_load:.1f}s")
+    print(f"label agreement: {agreement:.1%}")
+    print(f"logit delta: mean {logit_delta.mean():.4f}, max {logit_delta.max():.4f}")
+    print(
+        f"latency per clip: fp32 {fp32_time * 1000:.1f} ms, "
+        f"int8 {int8_time * 1000:.1f} ms, speedup {fp32_time / int8_time:.2f}x"
+    )
+
+    # Class folder names that match the model's labels give ground truth
+    label_names = {
+        label.lower(): label for label in fp32.VideoMAE_model.config.id2label.values()
+    }
+    truth = [
+        label_names.get(os.path.basename(os.path.dirname(path)).lower())
+        for _, path in clips
+    ]
+    labelled = [i for i, label in enumerate(truth) if label is not None]
+    if labelled:
+        fp32_accuracy = np.mean([fp32_labels[i] == truth[i] for i in labelled])
+        int8_accuracy = np.mean([int8_labels[i] == truth[i] for i in labelled])
+        print(
+            f"top-1 accuracy on {len(labelled)} labelled clips: "
+            f"fp32 {fp32_accuracy:.1%}, int8 {int8_accuracy:.1%}, "
+            f"delta {(int8_accuracy - fp32_accuracy) * 100:+.1f} points"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,7 @@ from PyQt5.QtWidgets import (
     QWidget,
 )
 
+from tools.model_registry import models, preload_modules
 from views.create_job import CreateJobView  # Import CreateJobView
 from views.job_panel import JobPanel
 from views.login import LoginView
@@ -27,7 +28,7 @@ from views.video_viewer import VideoViewer
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, workspace_path: str = None):
         super().__init__()
         self.setWindowTitle("Action Recognition")
         self.setStyleSheet(qdarktheme.load_stylesheet())
@@ -71,8 +72,10 @@ class MainWindow(QMainWindow):
         self.jobComboBox.addItem(job_icon, "Open Job")
         self.jobComboBox.addItem(job_icon, "Save Job")
 
-        # Init workspace path
-        self.workspace_path = os.path.abspath(__file__ + "/../workspace")
+        # Init workspace path, the workspace folder next to this file by default
+        self.workspace_path = workspace_path or os.path.abspath(
+            __file__ + "/../workspace"
+        )
         if not os.path.exists(self.workspace_path):
             os.makedirs(self.workspace_path)
         datajobs_path = os.path.join(self.workspace_path, "datajobs.json")
@@ -369,6 +372,17 @@ class MainWindow(QMainWindow):
         self.videoWidget.setEnabled(True)
         self.videoWidget.toolbar.setEnabled(True)
 
+        # Load and warm up the models while the user picks a job
+        models.warm_up(
+            [
+                (
+                    "yolo",
+                    os.path.join(os.path.dirname(__file__), "models/yolo11s-pose.pt"),
+                ),
+                ("videomae", "models/VideoMAE"),
+            ]
+        )
+
     def onUsername(self, username):
         self.username = username
 
@@ -490,17 +504,39 @@ class MainWindow(QMainWindow):
         if self.job_path:
             self.onJob(self.job_path)
 
-    def showProcessedVideo(self, frames, fps):
-        """Display processed video frames in the existing video viewer"""
-        if frames:
-            # Update layout to ensure video viewer is visible
+    def closeEvent(self, event):
+        """Let background processing stop before the window closes"""
+        worker = None
+        try:
+            if self.jobPanel is not None:
+                worker = self.jobPanel.worker
+        except RuntimeError:
+            # Panel was already deleted
+            self.jobPanel = None
+        if worker is not None:
+            # Close again once the worker has finished, without blocking the GUI
+            self.jobPanel.cancelProcessing()
+            worker.finished.connect(self.close)
+            self.hide()
+            event.ignore()
+            return
+        super().closeEvent(event)
+
+    def showProcessedVideo(self, worker):
+        """Display frames of a processing worker in the video viewer"""
+        if not hasattr(self, "videoWidget"):
+            self.videoWidget = VideoViewer()
             mainLayout = self.widget.layout()
-            self.videoWidget.playFrames(frames, fps)
+            mainLayout.replaceWidget(mainLayout.itemAt(1).widget(), self.videoWidget)
+        worker.frameReady.connect(self.videoWidget.showFrame)
 
 
 def main():
     app = QApplication(sys.argv)
     window = MainWindow()
+    # Nothing imports torch until a model is needed, so start on it in the
+    # background once the event loop has shown the window
+    QtCore.QTimer.singleShot(0, preload_modules)
     sys.exit(app.exec_())
 
 
@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+import pytest
+
+from tools.clip_preprocessing import ClipPreprocessor
+
+transformers = pytest.importorskip("transformers")
+
+# Resizing differs from PIL's by a rounding step at most, which is 1/255
+# before normalisation and about 0.02 after it. Anything past this tolerance
+# means resize, interpolation or normalisation no longer match the model's
+RESIZE_TOLERANCE = 0.05
+
+
+def fixed_crops(height, width, frames=4, seed=0):
+    """Smooth uint8 images, like a person crop, from upscaled random noise"""
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, (frames, 16, 16, 3), dtype=np.uint8)
+    return [
+        cv2.resize(image, (width, height), interpolation=cv2.INTER_CUBIC)
+        for image in noise
+    ]
+
+
+@pytest.fixture(scope="module")
+def image_processor():
+    return transformers.VideoMAEImageProcessor()
+
+
+@pytest.fixture(scope="module")
+def native(image_processor):
+    preprocessor = ClipPreprocessor.from_image_processor(image_processor)
+    assert preprocessor is not None
+    return preprocessor
+
+
+@pytest.mark.parametrize(
+    "height, width",
+    [(320, 320), (320, 200), (180, 300), (150, 150)],
+    ids=["shrink", "tall", "wide", "enlarge"],
+)
+def test_matches_image_processor(image_processor, native, height, width):
+    frames = fixed_crops(height, width)
+    expected = image_processor(frames, return_tensors="np")["pixel_values"][0]
+    actual = native(frames)
+    assert actual.shape == expected.shape
+    assert actual.dtype == np.float32
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=RESIZE_TOLERANCE)
+
+
+def test_normalize_matches_image_processor(image_processor, native):
+    # Without resizing the two only differ by float rounding
+    crops = np.stack(fixed_crops(native.crop_height, native.crop_width, seed=1))
+    expected = image_processor(
+        [list(crops)], do_resize=False, do_center_crop=False, return_tensors="np"
+    )["pixel_values"][0]
+    np.testing.assert_allclose(native.normalize(crops), expected, rtol=0, atol=1e-5)
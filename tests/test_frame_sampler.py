@@ -0,0 +1,33 @@
+import cv2
+import numpy as np
+import pytest
+
+from tools.frame_sampler import FrameSampler
+
+
+@pytest.fixture(scope="module")
+def video_path(tmp_path_factory):
+    """60 frames at 30 fps, each frame filled with its own index"""
+    path = str(tmp_path_factory.mktemp("video") / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    for index in range(60):
+        writer.write(np.full((48, 64, 3), index * 4, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+@pytest.mark.parametrize("fps", [30, 10, 1])
+def test_samples_whole_video(video_path, fps):
+    sampler = FrameSampler(video_path, fps)
+    indices = [index for index, _, _ in sampler]
+    assert indices == [round(k * 30 / fps) for k in range(2 * fps)]
+    assert len(indices) == sampler.sampled_frames
+
+
+@pytest.mark.parametrize("fps", [30, 10])
+def test_reads_past_underestimated_frame_count(video_path, fps):
+    # Many containers report a frame count short of what actually decodes
+    sampler = FrameSampler(video_path, fps)
+    sampler.total_frames = 40
+    indices = [index for index, _, _ in sampler]
+    assert indices[-1] == 60 - 30 // fps
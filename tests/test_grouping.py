@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from benchmarks.bench_grouping import make_centers, scan_group_people
+from tools.grouping import DENSE_LIMIT, close_pairs, group_people
+
+
+def random_centers(rng, count):
+    """Integer centers, so some pairs sit exactly at the threshold"""
+    centers = rng.integers(0, 1000, (count, 2))
+    return [tuple(center) for center in centers.tolist()]
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize(
+    "count", [0, 1, 2, 5, DENSE_LIMIT, DENSE_LIMIT + 1, 250], ids=lambda n: f"n{n}"
+)
+def test_group_people_matches_scan(seed, count):
+    rng = np.random.default_rng(seed)
+    centers = random_centers(rng, count)
+    threshold = int(rng.choice([0, 50, 100, 200, 400]))
+    assert group_people(centers, threshold) == scan_group_people(centers, threshold)
+
+
+@pytest.mark.parametrize("count", [50, DENSE_LIMIT, 300, 1000])
+def test_group_people_matches_scan_on_crowds(count):
+    # Bunched centers give long chains, where scan order matters most
+    for seed in range(5):
+        centers = make_centers(count, seed=seed)
+        assert group_people(centers) == scan_group_people(centers)
+
+
+def test_grid_and_dense_pairs_agree():
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(0, 2000, (DENSE_LIMIT * 3, 2))
+    first, second = close_pairs(centers, 150)
+    grid = set(zip(first.tolist(), second.tolist()))
+
+    diff = centers[:, None, :] - centers[None, :, :]
+    close = np.triu((diff**2).sum(axis=2) < 150**2, k=1)
+    assert grid == set(zip(*(pairs.tolist() for pairs in np.nonzero(close))))
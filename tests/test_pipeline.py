@@ -0,0 +1,146 @@
+import itertools
+import random
+import threading
+import time
+
+import pytest
+
+from tools.pipeline import BatchWorker, PipelineCancelled, StagedPipeline
+
+
+def jittered(fn):
+    """fn with a random short delay, so workers finish out of order"""
+    rng = random.Random(0)
+    lock = threading.Lock()
+
+    def run(item):
+        with lock:
+            delay = rng.uniform(0, 0.003)
+        time.sleep(delay)
+        return fn(item)
+
+    return run
+
+
+def pipeline_threads(names):
+    return [
+        thread
+        for thread in threading.enumerate()
+        if thread.name.split("-")[0] in names and thread.is_alive()
+    ]
+
+
+def test_output_keeps_source_order_with_several_workers():
+    pipeline = StagedPipeline(
+        range(300),
+        [
+            ("double", jittered(lambda x: x * 2), 4),
+            ("increment", jittered(lambda x: x + 1), 3, 2),
+        ],
+        queue_size=4,
+    )
+    assert list(pipeline) == [x * 2 + 1 for x in range(300)]
+
+
+def test_stage_error_reaches_the_consumer_in_order():
+    seen = []
+
+    def fail_on_seven(x):
+        if x == 7:
+            raise ValueError("bad item")
+        return x
+
+    def record(x):
+        seen.append(x)
+        return x
+
+    pipeline = StagedPipeline(
+        range(50), [("check", fail_on_seven, 3), ("record", record, 2)]
+    )
+    results = []
+    with pytest.raises(ValueError, match="bad item"):
+        for item in pipeline:
+            results.append(item)
+
+    # Everything before the failing item comes out, and later stages never
+    # see the failed item itself
+    assert results == list(range(7))
+    assert 7 not in seen
+    assert not pipeline_threads({"check", "record", "pipeline"})
+
+
+def test_source_error_is_raised_after_earlier_items():
+    def source():
+        yield from range(5)
+        raise RuntimeError("source failed")
+
+    pipeline = StagedPipeline(source(), [("identity", lambda x: x, 2)])
+    results = []
+    with pytest.raises(RuntimeError, match="source failed"):
+        for item in pipeline:
+            results.append(item)
+    assert results == list(range(5))
+
+
+def test_close_mid_stream_stops_every_thread():
+    closed = threading.Event()
+
+    def source():
+        try:
+            yield from itertools.count()
+        finally:
+            closed.set()
+
+    pipeline = StagedPipeline(
+        source(),
+        [("slow", jittered(lambda x: x), 3), ("fast", lambda x: x, 2)],
+        queue_size=2,
+    )
+    frames = iter(pipeline)
+    assert [next(frames) for _ in range(10)] == list(range(10))
+    frames.close()  # Like a consumer that stops early
+
+    assert pipeline.stop_event.is_set()
+    assert closed.wait(1.0)  # The source generator was closed
+    deadline = time.monotonic() + 2.0
+    while pipeline_threads({"slow", "fast", "pipeline"}):
+        assert time.monotonic() < deadline, "pipeline threads left running"
+        time.sleep(0.01)
+
+
+def test_batch_worker_returns_results_to_their_callers():
+    worker = BatchWorker("square", lambda items: [x * x for x in items], 4, 2)
+    try:
+        futures = [worker.submit(x) for x in range(40)]
+        assert [future.result(timeout=2) for future in futures] == [
+            x * x for x in range(40)
+        ]
+        assert max(worker.batch_sizes) <= 4
+    finally:
+        worker.close()
+
+
+def test_batch_worker_fails_the_whole_batch_and_pending_items_on_close():
+    release = threading.Event()
+
+    def fn(items):
+        release.wait(1.0)
+        if 0 in items:
+            raise ValueError("bad batch")
+        return items
+
+    worker = BatchWorker("fail", fn, max_batch_size=1)
+    first = worker.submit(0)
+    pending = [worker.submit(x) for x in range(1, 4)]
+    release.set()
+    with pytest.raises(ValueError, match="bad batch"):
+        first.result(timeout=2)
+
+    worker.close()
+    for future in pending:
+        # Either ran before the stop, or was failed by close
+        try:
+            future.result(timeout=2)
+        except PipelineCancelled:
+            pass
+    assert not pipeline_threads({"fail"})
@@ -0,0 +1,326 @@
+"""Process every video of a job across a pool of worker processes
+
+Run from the repository root, for example overnight on a folder of camera
+exports copied into a job's videos folder:
+    python -m tools.batch_processing workspace/<job> --workers 4 --fps 5
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from queue import Empty
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov")
+OUTPUT_SUFFIX = "_inference"
+
+# Job processing in the app runs with the motion gate, and the gate settings
+# are part of the detections cache key, so command line runs use it too to
+# share their cached results with the app
+JOB_MOTION_GATE = True
+
+# Per worker process state, set up once by init_worker
+worker_state = {}
+
+
+def inference_output_path(job_path: str, video_path: str) -> str:
+    """Path of the annotated copy of a video in the job's videos folder"""
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    return os.path.join(job_path, "videos", f"{name}{OUTPUT_SUFFIX}.mp4")
+
+
+def job_cache_dir(video_path: str) -> str:
+    """Result cache folder for a video, the job's cache for videos in <job>/videos"""
+    folder = os.path.dirname(os.path.abspath(video_path))
+    if os.path.basename(folder) == "videos":
+        return os.path.join(os.path.dirname(folder), "cache")
+    return os.path.join(folder, "cache")
+
+
+def list_job_videos(job_path: str):
+    """Source videos of a job, leaving out annotated outputs"""
+    videos_dir = os.path.join(job_path, "videos")
+    if not os.path.isdir(videos_dir):
+        return []
+    return [
+        os.path.join(videos_dir, name)
+        for name in sorted(os.listdir(videos_dir))
+        if name.lower().endswith(VIDEO_EXTENSIONS)
+        and not os.path.splitext(name)[0].endswith(OUTPUT_SUFFIX)
+    ]
+
+
+class JobProgress:
+    """Frames done per file and for the whole job"""
+
+    def __init__(self, videos):
+        self.done = {video: 0 for video in videos}
+        self.total = {video: 0 for video in videos}
+        self.outputs = {}
+        self.errors = {}
+        self.start_time = time.monotonic()
+
+    @property
+    def job_done(self):
+        return sum(self.done.values())
+
+    @property
+    def job_total(self):
+        return sum(self.total.values())
+
+    @property
+    def finished(self):
+        return len(self.outputs) + len(self.errors)
+
+    def fraction(self, video=None):
+        done = self.done[video] if video else self.job_done
+        total = self.total[video] if video else self.job_total
+        return done / total if total else 0.0
+
+    def eta(self):
+        """Seconds left for the whole job at the rate seen so far"""
+        elapsed = time.monotonic() - self.start_time
+        fraction = self.fraction()
+        if fraction <= 0:
+            return None
+        return elapsed * (1 - fraction) / fraction
+
+
+def init_worker(settings, progress_queue):
+    """Load this worker's own YOLO and VideoMAE and limit its thread count"""
+    import cv2
+    import torch
+    from ultralytics import YOLO
+
+    from tools.model_registry import load_videomae
+
+    # Split the cores between workers instead of every worker using all
+    torch.set_num_threads(settings["threads"])
+    cv2.setNumThreads(settings["threads"])
+
+    worker_state["settings"] = settings
+    worker_state["progress"] = progress_queue
+    worker_state["yolo"] = YOLO(settings["yolo_path"])
+    worker_state["videomae"] = load_videomae(
+        settings["videomae_path"], settings["videomae_engine"]
+    )
+
+
+def _process_video(job_path, video_path):
+    from tools.video_preprocessing import VideoPreprocessing
+
+    settings = worker_state["settings"]
+    progress = worker_state["progress"]
+    processor = VideoPreprocessing(
+        video_path=video_path,
+        frame_size=settings["frame_size"],
+        fps=settings["fps"],
+        yolo_path=settings["yolo_path"],
+        videomae_path=settings["videomae_path"],
+        videomae_engine=settings["videomae_engine"],
+        cache_dir=os.path.join(job_path, "cache"),
+        motion_gate=settings["motion_gate"],
+        detection_stride=settings["detection_stride"],
+        detector_size=settings["detector_size"],
+        crop_from_source=settings["crop_from_source"],
+        yolo=worker_state["yolo"],
+        videomae=worker_state["videomae"],
+    )
+
+    total = processor.sampled_frames()
+    progress.put((video_path, 0, total))
+    output_path = inference_output_path(job_path, video_path)
+    done = 0
+    for done, _ in enumerate(processor.iter_video(output_path), start=1):
+        if done % 25 == 0:
+            progress.put((video_path, done, total))
+    progress.put((video_path, done, max(total, done)))
+    return output_path
+
+
+def process_job(
+    job_path: str,
+    videos=None,
+    workers: int = None,
+    frame_size=(1920, 1080),
+    fps: int = 30,
+    yolo_path: str = "models/yolo11s-pose.pt",
+    videomae_path: str = "models/VideoMAE",
+    videomae_engine: str = "torch",
+    motion_gate: bool = JOB_MOTION_GATE,
+    detection_stride: int = 1,
+    detector_size=None,
+    crop_from_source: bool = False,
+):
+    """Process videos of a job in parallel, yielding JobProgress as work advances
+
+    videos defaults to every source video in the job. Each worker process
+    loads its own models once and writes annotated copies next to the
+    sources, sharing the job's result cache. detector_size, when given, is
+    the resolution YOLO runs at instead of frame_size. videomae_engine "int8"
+    runs a dynamically quantized VideoMAE on the CPU, "onnx" runs it with
+    ONNX Runtime. motion_gate reuses the last boxes on frames that barely
+    changed, and is on like in the app so the app can reuse the results.
+    """
+    if videos is None:
+        videos = list_job_videos(job_path)
+    else:
+        # Bare file names refer to the job's videos folder
+        videos = [
+            video if os.path.exists(video) else os.path.join(job_path, "videos", video)
+            for video in videos
+        ]
+    progress = JobProgress(videos)
+    if not videos:
+        return
+
+    cpu_count = os.cpu_count() or 1
+    workers = max(1, min(workers or cpu_count // 2 or 1, len(videos)))
+    settings = {
+        "frame_size": tuple(frame_size),
+        "fps": fps,
+        "yolo_path": yolo_path,
+        "videomae_path": videomae_path,
+        "videomae_engine": videomae_engine,
+        "motion_gate": motion_gate,
+        "detection_stride": detection_stride,
+        "detector_size": tuple(detector_size) if detector_size else None,
+        "crop_from_source": crop_from_source,
+        "threads": max(1, cpu_count // workers),
+    }
+
+    # Spawn keeps torch and Qt state of the parent out of the workers
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        progress_queue = manager.Queue()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=init_worker,
+            initargs=(settings, progress_queue),
+        ) as pool:
+            pending = {
+                pool.submit(_process_video, job_path, video): video for video in videos
+            }
+            try:
+                while pending:
+                    finished, _ = wait(
+                        pending, timeout=0.5, return_when=FIRST_COMPLETED
+                    )
+                    drain_progress(progress_queue, progress)
+                    for future in finished:
+                        video = pending.pop(future)
+                        try:
+                            progress.outputs[video] = future.result()
+                        except Exception as e:
+                            progress.errors[video] = e
+                    yield progress
+            finally:
+                # Stopping early drops the videos that have not started yet
+                pool.shutdown(wait=True, cancel_futures=True)
+
+
+def drain_progress(progress_queue, progress):
+    """Move the progress reports workers queued into progress"""
+    while True:
+        try:
+            video, done, total = progress_queue.get_nowait()
+        except Empty:
+            return
+        progress.done[video] = done
+        progress.total[video] = total
+
+
+def add_processing_arguments(parser):
+    """Add the processing options shared by the batch and chunked command lines"""
+    from tools.model_registry import VIDEOMAE_KINDS
+
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--yolo", default="models/yolo11s-pose.pt")
+    parser.add_argument("--videomae", default="models/VideoMAE")
+    parser.add_argument(
+        "--videomae-engine",
+        choices=list(VIDEOMAE_KINDS),
+        default="torch",
+        help="int8 runs a dynamically quantized model on the CPU, onnx runs "
+        "the model with ONNX Runtime",
+    )
+    parser.add_argument(
+        "--motion-gate",
+        action=argparse.BooleanOptionalAction,
+        default=JOB_MOTION_GATE,
+        help="Reuse the last boxes on frames that barely changed, on like in the app",
+    )
+    parser.add_argument(
+        "--detection-stride", type=int, default=1, help="Run YOLO every k-th frame"
+    )
+    parser.add_argument(
+        "--detector-width", type=int, default=None, help="Defaults to --width"
+    )
+    parser.add_argument(
+        "--detector-height", type=int, default=None, help="Defaults to --height"
+    )
+    parser.add_argument(
+        "--crop-from-source",
+        action="store_true",
+        help="Cut attention crops from the full resolution frame",
+    )
+
+
+def processing_options(args):
+    """Processing keyword arguments from the options of add_processing_arguments"""
+    return {
+        "frame_size": (args.width, args.height),
+        "fps": args.fps,
+        "yolo_path": args.yolo,
+        "videomae_path": args.videomae,
+        "videomae_engine": args.videomae_engine,
+        "motion_gate": args.motion_gate,
+        "detection_stride": args.detection_stride,
+        "detector_size": (
+            args.detector_width or args.width,
+            args.detector_height or args.height,
+        ),
+        "crop_from_source": args.crop_from_source,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("job_path")
+    parser.add_argument("--videos", nargs="+", help="Subset of videos to process")
+    parser.add_argument("--workers", type=int, default=None)
+    add_processing_arguments(parser)
+    args = parser.parse_args()
+
+    progress = None
+    for progress in process_job(
+        args.job_path,
+        videos=args.videos,
+        workers=args.workers,
+        **processing_options(args),
+    ):
+        eta = progress.eta()
+        eta_text = f"{eta:.0f}s" if eta is not None else "-"
+        print(
+            f"\r{progress.finished}/{len(progress.done)} files, "
+            f"{progress.fraction():.1%} of frames, ETA {eta_text}",
+            end="",
+            flush=True,
+        )
+    print()
+
+    if progress is None:
+        print("No videos to process")
+        return
+    for video, output_path in progress.outputs.items():
+        print(f"{video} -> {output_path}")
+    for video, error in progress.errors.items():
+        print(f"{video} failed: {str(error)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import numpy as np
+
+from tools.detection import box_centers
+
+
+def box_iou(boxes1, boxes2):
+    """Pairwise IoU of two (n, 4) and (m, 4) arrays of x1, y1, x2, y2 boxes"""
+    top_left = np.maximum(boxes1[:, None, :2], boxes2[None, :, :2])
+    bottom_right = np.minimum(boxes1[:, None, 2:], boxes2[None, :, 2:])
+    overlap = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    area1 = (boxes1[:, 2:] - boxes1[:, :2]).prod(axis=1)
+    area2 = (boxes2[:, 2:] - boxes2[:, :2]).prod(axis=1)
+    union = area1[:, None] + area2[None, :] - overlap
+    return np.divide(overlap, union, out=np.zeros_like(overlap), where=union > 0)
+
+
+class BoxPropagator:
+    """Move the boxes of the last keyframe forward at constant velocity
+
+    yolo.track runs without persist, so track ids start over on every call
+    and cannot tell which box is which across keyframes. Boxes of two
+    keyframes are matched greedily by overlap instead, and each matched box
+    keeps moving at the speed it moved between them.
+    """
+
+    def __init__(self, min_iou: float = 0.3):
+        self.min_iou = min_iou
+        self.detections = None
+        self.velocities = None  # Box corner motion per frame
+        self.position = None
+
+    def update(self, detections, position: int, reset: bool = False):
+        """Store a keyframe's detections, estimating velocities from the last one"""
+        velocities = np.zeros((len(detections), 4), dtype=np.float32)
+        if (
+            not reset
+            and self.detections is not None
+            and len(detections)
+            and len(self.detections)
+            and position > self.position
+        ):
+            boxes = detections["box"]
+            previous = self.detections["box"]
+            iou = box_iou(boxes, previous)
+            taken_new = np.zeros(len(boxes), dtype=bool)
+            taken_old = np.zeros(len(previous), dtype=bool)
+            for flat in np.argsort(iou, axis=None)[::-1].tolist():
+                i, j = divmod(flat, len(previous))
+                if iou[i, j] < self.min_iou:
+                    break
+                if taken_new[i] or taken_old[j]:
+                    continue
+                taken_new[i] = taken_old[j] = True
+                velocities[i] = (boxes[i] - previous[j]) / (position - self.position)
+
+        self.detections = detections
+        self.velocities = velocities
+        self.position = position
+
+    def predict(self, position: int):
+        """Detections of the last keyframe moved forward to a later frame"""
+        predicted = self.detections.copy()
+        if not len(predicted):
+            return predicted
+        shift = self.velocities * (position - self.position)
+        predicted["box"] += shift
+        predicted["center"] = box_centers(predicted["box"])
+        if "keypoints" in predicted.dtype.names:
+            # Keypoints follow the middle of their box
+            middle = (shift[:, :2] + shift[:, 2:]) / 2
+            predicted["keypoints"][:, :, :2] += middle[:, None, :]
+        return predicted
+
+    def hold(self, detections, position: int):
+        """Anchor still boxes at a frame, so motion restarts from there"""
+        self.detections = detections
+        self.velocities = np.zeros((len(detections), 4), dtype=np.float32)
+        self.position = position
+
+    def reset(self):
+        self.detections = None
+        self.velocities = None
+        self.position = None
+
+
+class KeyframeDetector:
+    """Run a detector on every `stride`-th frame and propagate boxes in between
+
+    With a motion gate, frames that did not change reuse the last boxes
+    outright, and propagation carries on from the last unchanged frame with
+    the boxes standing still, instead of jumping by the motion of the whole
+    skipped stretch. Gate refreshes also run the detector and restart velocity
+    estimation, so two runs over the same video agree again after one.
+    Keyframes sit on fixed frame positions for the same reason.
+    """
+
+    def __init__(self, detect, stride: int = 1, motion_gate=None):
+        if stride < 1:
+            raise ValueError("Detection stride must be positive")
+        self.detect = detect
+        self.stride = stride
+        self.motion_gate = motion_gate
+        self.propagator = BoxPropagator()
+
+        self.last_detections = None
+        self.next_position = 0
+        self.detected = 0  # Frames that ran the detector
+        self.propagated = 0
+
+    def __call__(self, frame, thumbnail=None, position: int = None):
+        """Return detections for a frame, which must come in stream order"""
+        if position is None:
+            position = self.next_position
+        self.next_position = position + 1
+
+        refresh = False
+        if self.motion_gate is not None:
+            if thumbnail is None:
+                thumbnail = self.motion_gate.thumbnail(frame)
+            if (
+                not self.motion_gate.changed(thumbnail, position)
+                and self.last_detections is not None
+            ):
+                self.propagator.hold(self.last_detections, position)
+                return self.last_detections
+            refresh = position % self.motion_gate.refresh_every == 0
+
+        if self.last_detections is None or refresh or position % self.stride == 0:
+            self.last_detections = self.detect(frame)
+            self.propagator.update(self.last_detections, position, reset=refresh)
+            self.detected += 1
+        else:
+            self.last_detections = self.propagator.predict(position)
+            self.propagated += 1
+        return self.last_detections
+
+    def reset(self):
+        self.propagator.reset()
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+        self.last_detections = None
+        self.next_position = 0
+        self.detected = 0
+        self.propagated = 0
@@ -0,0 +1,99 @@
+import threading
+
+import cv2
+
+
+class CameraCapture:
+    """Read a camera on its own thread, keeping only the newest frame
+
+    cv2.VideoCapture.read hands out frames in the order the driver queued
+    them, so a consumer slower than the camera drifts further behind real
+    time. Here a thread reads as fast as the camera delivers and overwrites
+    a single slot, and read() always returns the freshest frame. Frames that
+    were overwritten before anyone read them are counted in `dropped`.
+
+    Frames are decoded into a few buffers that take turns, so a frame from
+    read() stays valid until the next read() and is reused after that.
+
+    The methods mirror cv2.VideoCapture, so it can stand in for one.
+    """
+
+    def __init__(self, source=0, fps: int = None, fourcc: str = None, buffer_size=1):
+        self.cap = cv2.VideoCapture(source)
+        if fourcc:
+            # MJPG lets most USB cameras deliver full frame rates at high resolutions
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        if fps:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+        # Keep the driver from queueing stale frames, not every backend supports it
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+
+        self.frame = None
+        self.handed_out = None  # Frame the consumer is working on
+        self.spare = []  # Buffers free to decode into
+        self.frame_id = 0  # Number of the newest frame
+        self.read_id = 0  # Number of the last frame handed out
+        self.captured = 0
+        self.dropped = 0
+
+        self.condition = threading.Condition()
+        self.running = self.cap.isOpened()
+        self.thread = None
+        if self.running:
+            self.thread = threading.Thread(target=self.capture_worker)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def isOpened(self):
+        return self.running
+
+    def capture_worker(self):
+        """Worker thread that reads the camera into the newest frame slot"""
+        while self.running:
+            with self.condition:
+                buffer = self.spare.pop() if self.spare else None
+            ret, frame = self.cap.read(buffer)
+            with self.condition:
+                if not ret:
+                    # Camera unplugged or stream ended
+                    self.running = False
+                    self.condition.notify_all()
+                    break
+                if self.frame_id > self.read_id:
+                    self.dropped += 1  # Overwritten before it was read
+                    self.spare.append(self.frame)
+                self.frame = frame
+                self.frame_id += 1
+                self.captured += 1
+                self.condition.notify_all()
+
+    def read(self, timeout: float = None):
+        """Return (ret, frame) for the newest frame not read yet
+
+        Waits up to timeout seconds for one to arrive, forever when None and
+        not at all when 0. ret is False when no new frame came in time.
+        """
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.frame_id > self.read_id or not self.running, timeout
+            )
+            if self.frame_id <= self.read_id:
+                return False, None
+            if self.handed_out is not None:
+                self.spare.append(self.handed_out)
+            self.read_id = self.frame_id
+            self.handed_out = self.frame
+            return True, self.frame
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def release(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)  # Wait up to 1 second
+            if self.thread.is_alive():
+                print("Warning: Capture thread did not stop cleanly")
+        self.cap.release()
@@ -1,28 +1,71 @@
 import threading
-from queue import Queue
 
 import cv2
 import numpy as np
-from ultralytics import YOLO
 
-from tools.run_VideoMAEmodel import RunVideoMAEmodel
+from tools.box_propagation import KeyframeDetector
+from tools.clip_queue import ClipQueue
+from tools.clip_scheduler import ClipScheduler
+from tools.detection import extract_detections, scale_detections
+from tools.frame_pool import FramePool
+from tools.grouping import attention_box, attention_crop, group_people
+from tools.model_registry import VIDEOMAE_KINDS, models
+from tools.motion_gate import MotionGate
 
 
 class CameraStreamingPreprocessing:
-    def __init__(self, frame_size: tuple, fps: int, yolo_path: str):
+    def __init__(
+        self,
+        frame_size: tuple,
+        fps: int,
+        yolo_path: str,
+        clip_window: int = 16,
+        clip_stride: int = 16,
+        clip_step: int = 1,
+        motion_gate: bool = False,
+        detection_stride: int = 1,
+        detector_size=None,
+        crop_from_source: bool = False,
+        queue_size: int = 2,
+        queue_policy: str = "latest",
+        videomae_engine: str = "torch",
+    ):
         self.frame_size = frame_size
+        # YOLO can run on a smaller image than frame_size, boxes are mapped back
+        self.detector_size = tuple(detector_size or frame_size)
+        # Take attention crops from the camera frame instead of the resized one
+        self.crop_from_source = crop_from_source
         self.fps = fps
-        self.yolo = YOLO(yolo_path)
+        # Shared models stay loaded between camera sessions
+        self.yolo = models.get("yolo", yolo_path)
         self.previous_center = None
+        self.attention = 320  # Side of the attention area in frame_size pixels
         self.selected_group = None
-        self.attention_frames = []
         self.current_prediction = None
+        self.prediction_metrics = None  # Queue metrics when the last prediction ran
 
-        # Initialize VideoMAE model
-        self.videomae = RunVideoMAEmodel("models/VideoMAE")
+        # Reused frame buffers, so the per-frame loop does not allocate frames
+        self.frame_pool = FramePool(max_free=2)
+        self.origin_frame = None
 
-        # Create queue for attention frames
-        self.attention_queue = Queue()
+        # Optionally skip detection while the camera sees no change, reusing
+        # the last boxes, and run YOLO only every detection_stride frames,
+        # moving boxes between
+        self.motion_gate = MotionGate() if motion_gate else None
+        self.keyframe_detector = KeyframeDetector(
+            self.detect_people, detection_stride, self.motion_gate
+        )
+
+        # Initialize VideoMAE model on the configured engine, see VIDEOMAE_KINDS
+        self.videomae = models.get(VIDEOMAE_KINDS[videomae_engine], "models/VideoMAE")
+
+        # Attention frames are cropped to the model input straight into the
+        # scheduler's ring buffer, which cuts them into clips
+        self.clip_scheduler = ClipScheduler(clip_window, clip_stride, clip_step)
+
+        # Clips wait here for VideoMAE, bounded so predictions stay fresh when
+        # classification is slower than the camera
+        self.attention_queue = ClipQueue(queue_size, queue_policy)
 
         # Start prediction thread
         self.prediction_thread = threading.Thread(target=self.prediction_worker)
@@ -33,63 +76,52 @@ class CameraStreamingPreprocessing:
         return np.sqrt((point1[0] - point2[0]) ** 2 + (point1[1] - point2[1]) ** 2)
 
     def group_people(self, centers, threshold=200):
-        n = len(centers)
-        groups = []
-        visited = [False] * n
+        return group_people(centers, threshold)
 
-        for i in range(n):
-            if visited[i]:
-                continue
-
-            group = [i]
-            visited[i] = True
-
-            for j in range(i + 1, n):
-                if visited[j]:
-                    continue
-
-                if any(
-                    self.euclidean_distance(centers[k], centers[j]) < threshold
-                    for k in group
-                ):
-                    group.append(j)
-                    visited[j] = True
-
-            groups.append(group)
-
-        return groups
+    def detect_people(self, detector_frame):
+        with models.lock(self.yolo):
+            results = self.yolo.track(detector_frame, stream=True)
+            detections = extract_detections(results)
+        height, width = detector_frame.shape[:2]
+        return scale_detections(detections, (width, height), self.frame_size)
 
     def process(self, frame):
-        person_boxes = []
-        centers = []
-
+        # The drawn frame goes to the GUI, the other buffers are reused
         resized_frame = cv2.resize(frame, self.frame_size)
-        origin_frame = resized_frame.copy()  # Save the origin for attention
-
-        results = self.yolo.track(resized_frame, stream=True)
-
-        for result in results:
-            classes_names = result.names
-            for box in result.boxes:
-                if box.conf[0] > 0.5:
-                    [x1, y1, x2, y2] = box.xyxy[0]
-                    x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-                    cls = int(box.cls[0])
-                    class_name = classes_names[cls]
-
-                    cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-                    person_boxes.append((x1, y1, x2, y2))
-                    centers.append((cx, cy))
-                    cv2.rectangle(resized_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    cv2.putText(
-                        resized_frame,
-                        f"{box.conf[0]:.2f}",
-                        (x1, y1),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        1,
-                        (0, 255, 0),
-                        2,
-                    )
+        if self.crop_from_source:
+            origin_frame = frame
+        else:
+            # Save the origin for attention
+            origin_frame = self.frame_pool.acquire(resized_frame.shape)
+            np.copyto(origin_frame, resized_frame)
+
+        detector_frame = resized_frame
+        if self.detector_size != tuple(self.frame_size):
+            width, height = self.detector_size
+            detector_frame = cv2.resize(
+                frame,
+                self.detector_size,
+                dst=self.frame_pool.acquire((height, width, 3)),
+                interpolation=cv2.INTER_AREA,
+            )
+        detections = self.keyframe_detector(detector_frame)
+        if detector_frame is not resized_frame:
+            self.frame_pool.release(detector_frame)
+        centers = [tuple(center) for center in detections["center"].tolist()]
+
+        for (x1, y1, x2, y2), conf in zip(
+            detections["box"].astype(np.int32).tolist(), detections["conf"].tolist()
+        ):
+            cv2.rectangle(resized_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.putText(
+                resized_frame,
+                f"{conf:.2f}",
+                (x1, y1),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                1,
+                (0, 255, 0),
+                2,
+            )
 
         groups = self.group_people(centers)
         attention_fr = None
@@ -126,13 +158,9 @@ class CameraStreamingPreprocessing:
         # print(f"Previous: {self.previous_center}, Selected: {self.selected_group}")
 
         if self.selected_group:
-            avg_center_x, avg_center_y = self.selected_group
-            size = 320
-            half_size = size // 2
-            top_left_x = max(avg_center_x - half_size, 0)
-            top_left_y = max(avg_center_y - half_size, 0)
-            bottom_right_x = min(avg_center_x + half_size, frame.shape[1])
-            bottom_right_y = min(avg_center_y + half_size, frame.shape[0])
+            top_left_x, top_left_y, bottom_right_x, bottom_right_y = attention_box(
+                self.selected_group, self.attention, self.frame_size
+            )
             cv2.rectangle(
                 resized_frame,
                 (top_left_x, top_left_y),
@@ -140,11 +168,16 @@ class CameraStreamingPreprocessing:
                 (255, 0, 0),
                 2,
             )
-
-            attention_fr = origin_frame[
-                top_left_y:bottom_right_y, top_left_x:bottom_right_x
-            ]
-        resized_frame = cv2.cvtColor(resized_frame, cv2.COLOR_BGR2RGB)
+            # Scaled to the camera's resolution when cropping from its frame
+            attention_fr = attention_crop(
+                origin_frame, self.selected_group, self.attention, self.frame_size
+            )
+        if origin_frame is not frame:
+            # The crop still points into it, it is released once copied
+            self.origin_frame = origin_frame
+        resized_frame = cv2.cvtColor(
+            resized_frame, cv2.COLOR_BGR2RGB, dst=resized_frame
+        )
 
         return resized_frame, attention_fr
 
@@ -152,13 +185,18 @@ class CameraStreamingPreprocessing:
         """Process frame and update prediction"""
         processed_frame, attention_frame = self.process(frame)
 
-        # Add attention frame to batch if exists
+        # Add attention frame to the clip scheduler if exists
         if attention_frame is not None:
-            self.attention_frames.append(attention_frame)
-            if len(self.attention_frames) == 16:
-                # Put batch in queue for processing
-                self.attention_queue.put(self.attention_frames.copy())
-                self.attention_frames = []
+            self.videomae.crop_frame(
+                attention_frame,
+                self.clip_scheduler.next_slot(self.videomae.crop_shape),
+            )
+            clip = self.clip_scheduler.push()
+            if clip is not None:
+                # Put clip in queue for processing
+                self.attention_queue.put(clip)
+        self.frame_pool.release(self.origin_frame)
+        self.origin_frame = None
 
         # Draw current prediction if exists
         if self.current_prediction:
@@ -177,15 +215,16 @@ class CameraStreamingPreprocessing:
     def prediction_worker(self):
         """Worker thread for processing attention frames"""
         while True:
-            attention_batch = self.attention_queue.get()
-            if attention_batch is None:
+            clip = self.attention_queue.get()
+            if clip is None:
                 break
 
             try:
                 # Process through VideoMAE
-                tensor_frames = self.videomae.transform(attention_batch)
-                logits = self.videomae.run(tensor_frames)
-                self.current_prediction = self.videomae.get_predict(logits)
+                with models.lock(self.videomae):
+                    labels, _ = self.videomae.classify_crops([clip])
+                self.current_prediction = labels[0]
+                self.prediction_metrics = self.attention_queue.metrics()
             except Exception as e:
                 print(f"Prediction error: {str(e)}")
 
@@ -194,7 +233,7 @@ class CameraStreamingPreprocessing:
         try:
             # print("Stopping prediction thread...")
             # Signal thread to stop
-            self.attention_queue.put(None)
+            self.attention_queue.close()
 
             # Wait for thread to finish
             if hasattr(self, "prediction_thread"):
@@ -205,10 +244,15 @@ class CameraStreamingPreprocessing:
                     print("Prediction thread stopped successfully")
 
             # Clear queues and resources
-            while not self.attention_queue.empty():
-                self.attention_queue.get()
+            metrics = self.attention_queue.metrics()
+            print(
+                f"Dropped {metrics['dropped']} of {metrics['queued']} clips "
+                f"under load"
+            )
+            self.attention_queue.reset()
 
-            self.attention_frames = []
+            self.clip_scheduler.reset()
+            self.keyframe_detector.reset()
             self.current_prediction = None
 
         except Exception as e:
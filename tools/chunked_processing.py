@@ -0,0 +1,388 @@
+"""Process one long video as frame ranges spread over several worker processes
+
+Run from the repository root, for example on a two hour recording:
+    python -m tools.chunked_processing recording.mp4 --chunks 8 --fps 5
+"""
+
+import argparse
+import multiprocessing
+import os
+from bisect import bisect_left
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cv2
+
+from tools.batch_processing import (
+    JobProgress,
+    add_processing_arguments,
+    drain_progress,
+    init_worker,
+    job_cache_dir,
+    processing_options,
+    worker_state,
+)
+from tools.clip_scheduler import ClipScheduler
+from tools.frame_sampler import FrameSampler
+from tools.result_cache import (
+    ResultCache,
+    pack_detections,
+    pack_predictions,
+    pack_selections,
+    unpack_selections,
+)
+
+
+def chunk_bounds(total: int, chunks: int):
+    """Split sampled frames [0, total) into (start, stop) ranges, the last one open"""
+    if total <= 0:
+        return [(0, None)]
+    chunks = max(1, min(chunks, total))
+    starts = [total * i // chunks for i in range(chunks)]
+    return list(zip(starts, starts[1:] + [None]))
+
+
+def scheduler_states(crop_positions, clip_window, clip_stride, clip_step):
+    """ClipScheduler (count, since_clip) before each attention crop is pushed
+
+    Clips depend on every crop before them, so the states are worked out over
+    the whole video once the selections are stitched together. A chunk can
+    then restore the state of the crop it starts from instead of replaying
+    the video from the beginning.
+    """
+    scheduler = ClipScheduler(clip_window, clip_stride, clip_step)
+    states = []
+    for _ in crop_positions:
+        states.append((scheduler.count, scheduler.since_clip))
+        scheduler.count += 1
+        scheduler.since_clip += 1
+        if scheduler.count >= scheduler.capacity and (
+            scheduler.since_clip >= scheduler.stride
+        ):
+            scheduler.since_clip = 0
+    return states
+
+
+def _chunk_processor(video_path):
+    from tools.video_preprocessing import VideoPreprocessing
+
+    settings = worker_state["settings"]
+    return VideoPreprocessing(
+        video_path=video_path,
+        frame_size=settings["frame_size"],
+        fps=settings["fps"],
+        yolo_path=settings["yolo_path"],
+        videomae_path=settings["videomae_path"],
+        videomae_engine=settings["videomae_engine"],
+        motion_gate=settings["motion_gate"],
+        detection_stride=settings["detection_stride"],
+        detector_size=settings["detector_size"],
+        crop_from_source=settings["crop_from_source"],
+        yolo=worker_state["yolo"],
+        videomae=worker_state["videomae"],
+    )
+
+
+def _detect_chunk(name, video_path, start, stop, warmup):
+    """Detect people on samples [start, stop)
+
+    Tracking, the motion gate and box propagation start `warmup` samples
+    early, so their state has settled by the time results count.
+    """
+    settings = worker_state["settings"]
+    progress = worker_state["progress"]
+    processor = _chunk_processor(video_path)
+
+    begin = max(0, start - warmup)
+    sampler = FrameSampler(video_path, settings["fps"], start=begin, stop=stop)
+    total = (stop if stop is not None else sampler.sampled_frames) - begin
+    progress.put((name, 0, total))
+
+    frame_indices, boxes_per_frame = [], []
+    done = 0
+    for done, (frame_index, _, frame) in enumerate(sampler, start=1):
+        position = begin + done - 1
+        resized_frame, origin_frame, detector_frame = processor.prepare(frame)
+        boxes = processor.gated_detect(detector_frame, position=position)
+        processor.frame_pool.release(resized_frame)
+        if origin_frame is not frame:
+            processor.frame_pool.release(origin_frame)
+        if detector_frame is not resized_frame:
+            processor.frame_pool.release(detector_frame)
+        if position >= start:
+            frame_indices.append(frame_index)
+            boxes_per_frame.append(boxes)
+        if done % 25 == 0:
+            progress.put((name, done, total))
+    progress.put((name, done, max(total, done)))
+    return frame_indices, boxes_per_frame
+
+
+def _classify_chunk(name, video_path, start, stop, begin, state, selections):
+    """Classify the clips that end on samples [start, stop)
+
+    Decoding starts at `begin`, the crop a full clip before the first crop of
+    the chunk, with the scheduler restored to its state there, so clips that
+    cross the chunk boundary come out the same as in a single pass.
+    selections covers the samples from begin to stop.
+    """
+    settings = worker_state["settings"]
+    progress = worker_state["progress"]
+    processor = _chunk_processor(video_path)
+    processor.attention = settings["attention"]
+    videomae = worker_state["videomae"]
+
+    scheduler = ClipScheduler(*settings["clip"])
+    scheduler.count, scheduler.since_clip = state
+
+    sampler = FrameSampler(video_path, settings["fps"], start=begin, stop=stop)
+    total = len(selections)
+    progress.put((name, 0, total))
+
+    predictions = []
+    positions, clips = [], []
+
+    def classify():
+        labels = videomae.classify_crops(clips)[0]
+        predictions.extend(zip(positions, labels))
+        positions.clear()
+        clips.clear()
+
+    done = 0
+    for done, (_, _, frame) in enumerate(sampler, start=1):
+        position = begin + done - 1
+        selected_group = selections[position - begin]
+        if selected_group is not None:
+            attention_frame = processor.attention_crop(
+                processor.crop_source(frame), selected_group
+            )
+            videomae.crop_frame(
+                attention_frame, scheduler.next_slot(videomae.crop_shape)
+            )
+            clip = scheduler.push()
+            # Clips ending before the chunk belong to the previous chunk
+            if clip is not None and position >= start:
+                positions.append(position)
+                clips.append(clip)
+                if len(clips) >= settings["max_batch_size"]:
+                    classify()
+        if done % 25 == 0:
+            progress.put((name, done, total))
+    if clips:
+        classify()
+    progress.put((name, done, max(total, done)))
+    return predictions
+
+
+def _run_chunks(pool, progress_queue, progress, calls):
+    """Submit (name, fn, *args) calls and yield progress until all finish"""
+    pending = {pool.submit(fn, name, *args): name for name, fn, *args in calls}
+    results = {}
+    while pending:
+        finished, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+        drain_progress(progress_queue, progress)
+        for future in finished:
+            name = pending.pop(future)
+            # A failed chunk fails the whole video
+            results[name] = future.result()
+            progress.outputs[name] = name
+        yield progress
+    return results
+
+
+def process_video_chunked(processor, chunks: int = None, warmup: int = 32):
+    """Fill the result cache of one video using a pool of worker processes
+
+    processor is the VideoPreprocessing the video will be shown with, and
+    must have a cache_dir. The sampled frames are split into `chunks` ranges.
+    Detection runs on every range in parallel, each one starting `warmup`
+    samples early, and the results are stitched in order. Group selection
+    then runs over the stitched detections in a single cheap pass, so its
+    state carries across chunk boundaries exactly. Clips are classified per
+    range, with the clip boundaries taken from the stitched selections.
+    Yields JobProgress as work advances, afterwards processor.iter_video()
+    replays the video from the cache.
+    """
+    if not processor.cache_dir:
+        raise ValueError("Chunked processing needs a cache_dir")
+
+    video_path = processor.video_path
+    cache = ResultCache(processor.cache_dir, video_path)
+    keys = processor.cache_keys(cache.video_hash)
+    selections = None
+    if cache.load("detections", keys["detections"]) is not None:
+        data = cache.load("selections", keys["selections"])
+        if data is not None:
+            selections = unpack_selections(data)
+            if cache.load("predictions", keys["predictions"]) is not None:
+                return
+
+    # Detections match a single pass after a motion gate refresh, or without
+    # a gate after two keyframes have set the box velocities
+    if processor.motion_gate is not None:
+        warmup = max(warmup, processor.motion_gate.refresh_every)
+    else:
+        warmup = max(warmup, 2 * processor.detection_stride)
+
+    cpu_count = os.cpu_count() or 1
+    chunks = max(1, chunks or cpu_count // 2 or 1)
+    total = processor.sampled_frames()
+    bounds = chunk_bounds(total, chunks)
+    workers = len(bounds)
+    settings = {
+        "frame_size": tuple(processor.frame_size),
+        "fps": processor.fps,
+        "yolo_path": processor.yolo_path,
+        "videomae_path": processor.videomae_path,
+        "videomae_engine": processor.videomae_engine,
+        "threads": max(1, cpu_count // workers),
+        "attention": processor.attention,
+        "motion_gate": processor.motion_gate is not None,
+        "detection_stride": processor.detection_stride,
+        "detector_size": processor.detector_size,
+        "crop_from_source": processor.crop_from_source,
+        "clip": (processor.clip_window, processor.clip_stride, processor.clip_step),
+        "max_batch_size": processor.max_batch_size,
+    }
+
+    detect_names = [f"detect {i + 1}/{workers}" for i in range(workers)]
+    classify_names = [f"classify {i + 1}/{workers}" for i in range(workers)]
+    progress = JobProgress(detect_names + classify_names)
+    for names in (detect_names, classify_names):
+        for name, (start, stop) in zip(names, bounds):
+            progress.total[name] = (stop or max(total, start + 1)) - start
+
+    # Spawn keeps torch and Qt state of the parent out of the workers
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        progress_queue = manager.Queue()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=init_worker,
+            initargs=(settings, progress_queue),
+        ) as pool:
+            try:
+                if selections is None:
+                    results = yield from _run_chunks(
+                        pool,
+                        progress_queue,
+                        progress,
+                        [
+                            (name, _detect_chunk, video_path, start, stop, warmup)
+                            for name, (start, stop) in zip(detect_names, bounds)
+                        ],
+                    )
+                    frame_indices, boxes_per_frame = [], []
+                    for name in detect_names:
+                        chunk_indices, chunk_boxes = results[name]
+                        frame_indices.extend(chunk_indices)
+                        boxes_per_frame.extend(chunk_boxes)
+
+                    # Selection follows the previous group, so it runs in order
+                    processor.previous_center = processor.selected_group = None
+                    selections = [
+                        processor.select_group(boxes) for boxes in boxes_per_frame
+                    ]
+                    cache.save(
+                        "detections",
+                        keys["detections"],
+                        **pack_detections(boxes_per_frame, frame_indices),
+                    )
+                    cache.save(
+                        "selections",
+                        keys["selections"],
+                        **pack_selections(selections),
+                    )
+                else:
+                    for name in detect_names:
+                        progress.done[name] = progress.total[name]
+                        progress.outputs[name] = name
+
+                crop_positions = [
+                    position
+                    for position, selected_group in enumerate(selections)
+                    if selected_group is not None
+                ]
+                states = scheduler_states(crop_positions, *settings["clip"])
+                capacity = ClipScheduler(*settings["clip"]).capacity
+
+                calls = []
+                for name, (start, stop) in zip(classify_names, bounds):
+                    stop = len(selections) if stop is None else stop
+                    first = bisect_left(crop_positions, start)
+                    if first >= len(crop_positions) or crop_positions[first] >= stop:
+                        # No attention crops, so no clips end in this chunk
+                        progress.done[name] = progress.total[name]
+                        progress.outputs[name] = name
+                        continue
+                    # Start a full clip early so boundary clips see all their crops
+                    warm = max(0, first - (capacity - 1))
+                    begin = crop_positions[warm]
+                    progress.total[name] = stop - begin
+                    calls.append(
+                        (
+                            name,
+                            _classify_chunk,
+                            video_path,
+                            start,
+                            stop,
+                            begin,
+                            states[warm],
+                            selections[begin:stop],
+                        )
+                    )
+                results = yield from _run_chunks(pool, progress_queue, progress, calls)
+                predictions = []
+                for name in classify_names:
+                    predictions.extend(results.get(name, []))
+                cache.save(
+                    "predictions",
+                    keys["predictions"],
+                    **pack_predictions(predictions),
+                )
+            finally:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+
+def main():
+    from tools.video_preprocessing import VideoPreprocessing
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("video_path")
+    parser.add_argument("--chunks", type=int, default=None)
+    parser.add_argument("--warmup", type=int, default=32)
+    add_processing_arguments(parser)
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Defaults to the job's cache for videos in <job>/videos, the app's cache",
+    )
+    parser.add_argument("--output", default=None, help="Write an annotated copy here")
+    args = parser.parse_args()
+
+    cache_dir = args.cache_dir or job_cache_dir(args.video_path)
+    processor = VideoPreprocessing(
+        video_path=args.video_path,
+        cache_dir=cache_dir,
+        **processing_options(args),
+    )
+
+    for progress in process_video_chunked(processor, args.chunks, args.warmup):
+        eta = progress.eta()
+        eta_text = f"{eta:.0f}s" if eta is not None else "-"
+        print(
+            f"\r{progress.fraction():.1%} of frames, ETA {eta_text}",
+            end="",
+            flush=True,
+        )
+    print()
+
+    if args.output:
+        # Everything is cached now, so this only decodes, draws and encodes
+        for _ in processor.iter_video(args.output):
+            pass
+        print(f"{args.video_path} -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
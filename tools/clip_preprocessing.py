@@ -0,0 +1,77 @@
+import cv2
+import numpy as np
+
+
+class ClipPreprocessor:
+    """OpenCV and numpy version of the VideoMAE image processor
+
+    Each frame is resized so its shortest edge matches the processor's size
+    and center cropped into one preallocated uint8 clip array, then the whole
+    clip is rescaled and normalised in a single vectorized operation. Frames
+    keep their channel order, just like with the image processor.
+
+    Downscaling uses INTER_AREA where PIL uses an antialiased bilinear
+    filter, so values differ from the processor's by a few gray levels.
+    """
+
+    def __init__(self, shortest_edge: int, crop_size, mean, std, rescale=1 / 255):
+        self.shortest_edge = shortest_edge
+        self.crop_height, self.crop_width = crop_size
+        # x * rescale normalised is x * scale - offset
+        std = np.asarray(std, dtype=np.float32)
+        self.scale = (rescale / std).astype(np.float32)
+        self.offset = (np.asarray(mean, dtype=np.float32) / std).astype(np.float32)
+
+    @classmethod
+    def from_image_processor(cls, image_processor):
+        """Build from a VideoMAEImageProcessor, None when its settings are not supported"""
+        size = getattr(image_processor, "size", None) or {}
+        crop_size = getattr(image_processor, "crop_size", None) or {}
+        if not (
+            getattr(image_processor, "do_resize", False)
+            and getattr(image_processor, "do_center_crop", False)
+            and getattr(image_processor, "do_rescale", False)
+            and getattr(image_processor, "do_normalize", False)
+            and "shortest_edge" in size
+            and "height" in crop_size
+        ):
+            return None
+        return cls(
+            size["shortest_edge"],
+            (crop_size["height"], crop_size["width"]),
+            image_processor.image_mean,
+            image_processor.image_std,
+            image_processor.rescale_factor,
+        )
+
+    def resize_crop(self, frame, out):
+        """Resize frame by its shortest edge and center crop it into out"""
+        height, width = frame.shape[:2]
+        if width <= height:
+            size = (self.shortest_edge, int(self.shortest_edge * height / width))
+        else:
+            size = (int(self.shortest_edge * width / height), self.shortest_edge)
+        shrink = size[0] < width
+        resized = cv2.resize(
+            frame,
+            size,
+            interpolation=cv2.INTER_AREA if shrink else cv2.INTER_LINEAR,
+        )
+        top = (size[1] - self.crop_height) // 2
+        left = (size[0] - self.crop_width) // 2
+        out[:] = resized[top : top + self.crop_height, left : left + self.crop_width]
+
+    def normalize(self, clip):
+        """(..., H, W, C) uint8 frames to normalised (..., C, H, W) float32"""
+        # Moving channels first is cheaper on uint8 than on float32
+        normalized = np.ascontiguousarray(np.moveaxis(clip, -1, -3)).astype(np.float32)
+        normalized *= self.scale[:, None, None]
+        normalized -= self.offset[:, None, None]
+        return normalized
+
+    def __call__(self, frames):
+        """(T, C, H, W) float32 model input for a list of uint8 frames"""
+        clip = np.empty((len(frames), self.crop_height, self.crop_width, 3), np.uint8)
+        for frame, out in zip(frames, clip):
+            self.resize_crop(frame, out)
+        return self.normalize(clip)
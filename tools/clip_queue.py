@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import deque
+
+POLICIES = ("drop_oldest", "drop_newest", "latest")
+
+
+class ClipQueue:
+    """Bounded queue between clip capture and a slower classifier
+
+    When the queue is full, `drop_oldest` makes room by discarding the
+    oldest clip, `drop_newest` discards the incoming clip, and `latest`
+    keeps only the newest clip whatever maxsize says. Clips remember when
+    they were queued, so the consumer can tell how stale a prediction is.
+    """
+
+    def __init__(self, maxsize: int = 2, policy: str = "latest"):
+        if policy not in POLICIES:
+            raise ValueError(
+                f"Unknown queue policy {policy!r}, expected one of {POLICIES}"
+            )
+        if maxsize < 1:
+            raise ValueError("Queue size must be positive")
+        self.maxsize = 1 if policy == "latest" else maxsize
+        self.policy = policy
+
+        self.items = deque()  # (clip, time queued)
+        self.condition = threading.Condition()
+        self.closed = False
+
+        self.queued = 0
+        self.dropped = 0
+        self.clip_age = None  # Seconds the last clip waited before inference
+
+    def put(self, clip):
+        """Queue a clip, dropping one by the policy when full"""
+        with self.condition:
+            self.queued += 1
+            if len(self.items) >= self.maxsize:
+                self.dropped += 1
+                if self.policy == "drop_newest":
+                    return
+                self.items.popleft()
+            self.items.append((clip, time.monotonic()))
+            self.condition.notify()
+
+    def get(self):
+        """Wait for the next clip, returning None once the queue is closed"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.items or self.closed)
+            if self.closed:
+                return None
+            clip, queued_at = self.items.popleft()
+            self.clip_age = time.monotonic() - queued_at
+            return clip
+
+    def close(self):
+        """Wake up and stop the consumer, dropping clips still queued"""
+        with self.condition:
+            self.closed = True
+            self.items.clear()
+            self.condition.notify_all()
+
+    def reset(self):
+        with self.condition:
+            self.items.clear()
+            self.closed = False
+            self.queued = 0
+            self.dropped = 0
+            self.clip_age = None
+
+    def metrics(self):
+        """Queue depth, drops and the age of the last clip at inference"""
+        with self.condition:
+            return {
+                "depth": len(self.items),
+                "queued": self.queued,
+                "dropped": self.dropped,
+                "clip_age": self.clip_age,
+            }
@@ -0,0 +1,64 @@
+import numpy as np
+
+
+class ClipScheduler:
+    """Cut a stream of transformed attention frames into (overlapping) clips
+
+    Frames are pushed already at the model input size and are kept in a
+    fixed ring buffer, so overlapping clips reuse them instead of
+    transforming again. Crops can also be written straight into next_slot()
+    and committed with push(), which leaves nothing to allocate per frame. A
+    clip holds `window` frames taken every `step` frames, and a new clip is
+    emitted after every `stride` pushed frames. stride == window with step 1
+    gives the back-to-back 16 frame blocks used before.
+    """
+
+    def __init__(self, window: int = 16, stride: int = 16, step: int = 1):
+        if window < 1 or stride < 1 or step < 1:
+            raise ValueError("window, stride and step must be positive")
+        self.window = window
+        self.stride = stride
+        self.step = step
+        self.capacity = (window - 1) * step + 1  # Frames spanned by one clip
+
+        self.buffer = None  # Allocated on the first push, once the shape is known
+        self.count = 0  # Frames pushed so far
+        self.since_clip = 0  # Frames pushed since the last emitted clip
+
+    def next_slot(self, shape, dtype=np.uint8):
+        """Buffer slot the next pushed frame goes into, to write it in place"""
+        if self.buffer is None:
+            self.buffer = np.empty((self.capacity,) + tuple(shape), dtype=dtype)
+        return self.buffer[self.count % self.capacity]
+
+    def push(self, frame: np.ndarray = None):
+        """Store one transformed frame, returning a clip when one is due
+
+        Without a frame, whatever was written into next_slot() is pushed.
+        """
+        if frame is not None:
+            self.next_slot(frame.shape, frame.dtype)[...] = frame
+        self.count += 1
+        self.since_clip += 1
+
+        if self.count >= self.capacity and self.since_clip >= self.stride:
+            self.since_clip = 0
+            return self.clip()
+        return None
+
+    def clip(self):
+        """Return the clip ending at the newest frame as a (window, ...) array
+
+        Before a full clip span was pushed, the frames so far are padded with
+        the newest one, like RunVideoMAEmodel.transform pads short clips.
+        """
+        last = self.count - 1
+        if self.count < self.capacity:
+            indices = np.minimum(np.arange(self.window) * self.step, last)
+            return self.buffer[indices]
+        indices = last - self.step * np.arange(self.window - 1, -1, -1)
+        return self.buffer[indices % self.capacity]
+
+    def reset(self):
+        self.count = 0
+        self.since_clip = 0
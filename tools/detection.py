@@ -0,0 +1,91 @@
+import numpy as np
+
+
+def detection_dtype(num_keypoints: int = 0):
+    """Structured dtype of one detection record, with keypoints for pose models"""
+    fields = [
+        ("box", np.float32, (4,)),  # x1, y1, x2, y2
+        ("conf", np.float32),
+        ("cls", np.int32),
+        ("track_id", np.int32),  # -1 when the tracker gave no id
+        ("center", np.int32, (2,)),
+    ]
+    if num_keypoints:
+        fields.append(("keypoints", np.float32, (num_keypoints, 3)))  # x, y, conf
+    return np.dtype(fields)
+
+
+def box_centers(xyxy):
+    """Integer box centers, the same as (int(x1) + int(x2)) // 2 on every box"""
+    corners = np.asarray(xyxy).astype(np.int32)
+    return (corners[:, :2] + corners[:, 2:]) // 2
+
+
+def scale_detections(detections, from_size, to_size):
+    """Map detections found on a from_size (w, h) image onto a to_size image"""
+    scale_x = to_size[0] / from_size[0]
+    scale_y = to_size[1] / from_size[1]
+    if scale_x == 1 and scale_y == 1:
+        return detections
+    scaled = detections.copy()
+    scaled["box"] *= np.array([scale_x, scale_y, scale_x, scale_y], dtype=np.float32)
+    scaled["center"] = box_centers(scaled["box"])
+    if "keypoints" in scaled.dtype.names:
+        scaled["keypoints"][:, :, 0] *= scale_x
+        scaled["keypoints"][:, :, 1] *= scale_y
+    return scaled
+
+
+def _numpy(tensor):
+    # Results hold torch tensors, possibly on the GPU
+    if hasattr(tensor, "cpu"):
+        tensor = tensor.cpu()
+    if hasattr(tensor, "numpy"):
+        tensor = tensor.numpy()
+    return np.asarray(tensor)
+
+
+def extract_detections(results, conf_threshold: float = 0.5):
+    """Turn YOLO results into one structured array of detections
+
+    Every field is copied out of the result tensors once per frame, the
+    confidence filter is a single mask and centers come from array
+    arithmetic, so the cost no longer grows with per-box tensor indexing.
+    """
+    records = [_extract_result(result, conf_threshold) for result in results]
+    if len(records) == 1:
+        return records[0]
+    if not records:
+        return np.zeros(0, dtype=detection_dtype())
+    return np.concatenate(records)
+
+
+def _extract_result(result, conf_threshold):
+    keypoints = getattr(result, "keypoints", None)
+    num_keypoints = 0
+    if keypoints is not None:
+        keypoints = _numpy(keypoints.data)
+        num_keypoints = keypoints.shape[1]
+
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return np.zeros(0, dtype=detection_dtype(num_keypoints))
+
+    conf = _numpy(boxes.conf).astype(np.float32).reshape(-1)
+    keep = conf > conf_threshold
+    detections = np.zeros(int(keep.sum()), dtype=detection_dtype(num_keypoints))
+
+    xyxy = _numpy(boxes.xyxy).astype(np.float32).reshape(-1, 4)[keep]
+    detections["box"] = xyxy
+    detections["conf"] = conf[keep]
+    detections["cls"] = _numpy(boxes.cls).reshape(-1)[keep]
+    if boxes.id is not None:
+        detections["track_id"] = _numpy(boxes.id).reshape(-1)[keep]
+    else:
+        detections["track_id"] = -1
+
+    detections["center"] = box_centers(xyxy)
+
+    if num_keypoints:
+        detections["keypoints"] = keypoints[keep]
+    return detections
@@ -0,0 +1,41 @@
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+
+class FramePool:
+    """Hand out reusable frame buffers instead of allocating one per frame
+
+    OpenCV writes into a buffer passed as dst (or image for VideoCapture.read)
+    when its shape and type fit, so a pipeline that releases its frames once
+    it is done with them stops allocating full frames after warming up. A
+    released buffer must not be used any more by whoever released it.
+    """
+
+    def __init__(self, max_free: int = 16):
+        self.max_free = max_free  # Buffers kept per shape
+        self.free = defaultdict(list)  # (shape, dtype) -> buffers
+        self.lock = threading.Lock()
+        self.allocated = 0
+        self.reused = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        """Return a buffer of that shape, its content is undefined"""
+        key = (tuple(shape), np.dtype(dtype))
+        with self.lock:
+            if self.free[key]:
+                self.reused += 1
+                return self.free[key].pop()
+            self.allocated += 1
+        return np.empty(key[0], dtype=key[1])
+
+    def release(self, *buffers):
+        """Give buffers back for reuse, None entries are ignored"""
+        with self.lock:
+            for buffer in buffers:
+                if buffer is None or buffer.base is not None:
+                    continue  # Views share memory with something still in use
+                free = self.free[(buffer.shape, buffer.dtype)]
+                if len(free) < self.max_free:
+                    free.append(buffer)
@@ -0,0 +1,106 @@
+import cv2
+
+
+class FrameSampler:
+    """Read a video at a target fps, skipping unwanted frames cheaply
+
+    Frames between two samples are skipped with ``grab()``, which advances the
+    stream without converting the frame to BGR or copying it out. When the gap
+    to the next sample is long enough the sampler seeks by timestamp instead,
+    so decode work follows the analysis fps rather than the source fps.
+    """
+
+    def __init__(
+        self,
+        video_path: str,
+        fps: float,
+        seek_after: float = 2.0,
+        start: int = 0,
+        stop: int = None,
+        pool=None,
+    ):
+        self.video_path = video_path
+        # Seek instead of grabbing when the next sample is this many seconds away
+        self.seek_after = seek_after
+        # Range of samples to yield, used to split a video into chunks
+        self.start = start
+        self.stop = stop
+        # FramePool to decode into, consumers release frames they are done with
+        self.pool = pool
+
+        self.cap = cv2.VideoCapture(video_path)
+        if not self.cap.isOpened():
+            raise ValueError(f"Error opening video file: {video_path}")
+
+        self.video_fps = self.cap.get(cv2.CAP_PROP_FPS) or float(fps)
+        # Above the source fps every frame is sampled, so sample k is frame k
+        self.fps = min(fps, self.video_fps)
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.frame_shape = (
+            int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        )
+
+        # Counters for checking how much work sampling saved
+        self.decoded = 0
+        self.skipped = 0
+        self.seeks = 0
+
+    @property
+    def sampled_frames(self):
+        """Number of frames the sampler will yield, if the length is known"""
+        if self.total_frames <= 0:
+            return 0
+        duration = self.total_frames / self.video_fps
+        return max(1, int(duration * self.fps))
+
+    def __iter__(self):
+        """Yield (frame_index, timestamp, frame) for every sampled frame"""
+        position = 0  # Index of the frame the next read() returns
+        sample = self.start
+        seek_gap = max(1, int(self.seek_after * self.video_fps))
+
+        try:
+            while self.cap.isOpened():
+                if self.stop is not None and sample >= self.stop:
+                    break
+
+                # Sample k sits at k / fps seconds, mapped to the nearest source frame
+                timestamp = sample / self.fps
+                target = int(round(timestamp * self.video_fps))
+                sample += 1
+
+                # The frame count is only an estimate in many containers, so
+                # the end of the video is wherever decoding runs out
+                gap = target - position
+                if gap >= seek_gap:
+                    self.cap.set(
+                        cv2.CAP_PROP_POS_MSEC, target * 1000.0 / self.video_fps
+                    )
+                    position = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+                    self.seeks += 1
+                    gap = max(0, target - position)
+
+                for _ in range(gap):
+                    if not self.cap.grab():
+                        return
+                    self.skipped += 1
+                position = target
+
+                if self.pool is not None:
+                    buffer = self.pool.acquire(self.frame_shape + (3,))
+                    ret, frame = self.cap.read(buffer)
+                else:
+                    ret, frame = self.cap.read()
+                if not ret:
+                    break
+                self.decoded += 1
+                position += 1
+
+                yield target, target / self.video_fps, frame
+        finally:
+            self.release()
+
+    def release(self):
+        if self.cap.isOpened():
+            self.cap.release()
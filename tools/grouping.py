@@ -0,0 +1,118 @@
+import heapq
+
+import numpy as np
+
+# Up to this many centers a full distance matrix is cheaper than a grid
+DENSE_LIMIT = 100
+
+
+def close_pairs(centers, threshold=200):
+    """Index pairs (i, j), i < j, of centers closer than threshold
+
+    Small sets compare all pairs in one array operation. Larger ones are
+    binned into a grid of threshold sized cells, so only the 3x3 block of
+    cells around a center can hold its neighbours and the work grows with
+    the number of close pairs instead of all pairs.
+    """
+    points = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+    empty = np.zeros(0, dtype=np.int64)
+    if len(points) < 2 or threshold <= 0:
+        return empty, empty
+    limit = threshold * threshold
+
+    if len(points) <= DENSE_LIMIT:
+        diff = points[:, None, :] - points[None, :, :]
+        close = np.triu((diff**2).sum(axis=2) < limit, k=1)
+        return np.nonzero(close)
+
+    cells = np.floor(points / threshold).astype(np.int64)
+    grid = {}
+    for index, cell in enumerate(map(tuple, cells.tolist())):
+        grid.setdefault(cell, []).append(index)
+
+    firsts, seconds = [], []
+    for (cx, cy), members in grid.items():
+        members = np.array(members, dtype=np.int64)
+        candidates = np.array(
+            [
+                index
+                for dx in (-1, 0, 1)
+                for dy in (-1, 0, 1)
+                for index in grid.get((cx + dx, cy + dy), ())
+            ],
+            dtype=np.int64,
+        )
+        diff = points[members][:, None, :] - points[candidates][None, :, :]
+        close = (diff**2).sum(axis=2) < limit
+        # Keep each pair once, from its lower index
+        close &= members[:, None] < candidates[None, :]
+        rows, cols = np.nonzero(close)
+        firsts.append(members[rows])
+        seconds.append(candidates[cols])
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+
+def group_people(centers, threshold=200):
+    """Group centers closer than threshold, matching the original greedy scan
+
+    The original scan starts a group at the lowest unassigned index i and
+    then visits j = i + 1, i + 2, ... once, adding j when it is close to a
+    member found so far. A center therefore joins only when a chain of
+    increasing indices links it to i, which is not the same as connected
+    components. Walking the proximity graph with a min-heap, and only
+    stepping to higher indices, reproduces those groups in the same order.
+    """
+    n = len(centers)
+    higher = [[] for _ in range(n)]  # Close centers with a higher index
+    for i, j in zip(*(pairs.tolist() for pairs in close_pairs(centers, threshold))):
+        higher[i].append(j)
+
+    visited = [False] * n
+    groups = []
+    for i in range(n):
+        if visited[i]:
+            continue
+
+        group = []
+        frontier = [i]
+        visited[i] = True
+        while frontier:
+            j = heapq.heappop(frontier)
+            group.append(j)
+            for k in higher[j]:
+                if not visited[k]:
+                    visited[k] = True
+                    heapq.heappush(frontier, k)
+
+        groups.append(group)
+
+    return groups
+
+
+def attention_box(center, size, frame_size):
+    """Corners of the size x size area around a group center, clipped to frame_size"""
+    center_x, center_y = center
+    half_size = size // 2
+    return (
+        max(center_x - half_size, 0),
+        max(center_y - half_size, 0),
+        min(center_x + half_size, frame_size[0]),
+        min(center_y + half_size, frame_size[1]),
+    )
+
+
+def attention_crop(origin_frame, center, size, frame_size):
+    """Cut the attention area out of an image of any resolution
+
+    The area is clipped in frame_size pixels, where centers live, and only
+    then scaled to the image, so it covers the same part of the scene at
+    every resolution.
+    """
+    x1, y1, x2, y2 = attention_box(center, size, frame_size)
+    height, width = origin_frame.shape[:2]
+    if (width, height) != tuple(frame_size):
+        scale_x = width / frame_size[0]
+        scale_y = height / frame_size[1]
+        x1, x2 = int(x1 * scale_x), int(x2 * scale_x)
+        y1, y2 = int(y1 * scale_y), int(y2 * scale_y)
+    return origin_frame[y1:y2, x1:x2]
@@ -0,0 +1,221 @@
+import contextlib
+import importlib
+import os
+import sys
+import threading
+import time
+import weakref
+
+import numpy as np
+
+
+def _load_yolo(path):
+    from ultralytics import YOLO
+
+    return YOLO(path)
+
+
+def _warm_up_yolo(yolo):
+    # The first call sets up the predictor and picks the device
+    yolo.predict(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)
+
+
+def _load_videomae(path):
+    from tools.run_VideoMAEmodel import RunVideoMAEmodel
+
+    return RunVideoMAEmodel(path)
+
+
+def _load_videomae_int8(path):
+    from tools.run_VideoMAEmodel import RunVideoMAEmodel
+
+    return RunVideoMAEmodel(path, quantize=True)
+
+
+def _load_videomae_onnx(path):
+    from tools.run_VideoMAEonnx import RunVideoMAEonnx
+
+    return RunVideoMAEonnx(path)
+
+
+def _warm_up_videomae(videomae):
+    num_frames = videomae.config.num_frames
+    videomae.classify_crops([np.zeros((num_frames,) + videomae.crop_shape, np.uint8)])
+
+
+# Imported by the models, each takes seconds to import on its own
+HEAVY_MODULES = ("torch", "ultralytics", "transformers")
+
+
+def preload_modules(modules=HEAVY_MODULES):
+    """Import heavy modules on a background thread, so first use is quick"""
+
+    def run():
+        for module in modules:
+            try:
+                importlib.import_module(module)
+            except ImportError as e:
+                print(f"Preloading {module} failed: {str(e)}")
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+LOADERS = {
+    "yolo": (_load_yolo, _warm_up_yolo),
+    "videomae": (_load_videomae, _warm_up_videomae),
+    "videomae_int8": (_load_videomae_int8, _warm_up_videomae),
+    "videomae_onnx": (_load_videomae_onnx, _warm_up_videomae),
+}
+
+# Registry kind of VideoMAE for each videomae_engine setting
+VIDEOMAE_KINDS = {
+    "torch": "videomae",
+    "int8": "videomae_int8",  # Dynamic INT8 quantization, CPU only
+    "onnx": "videomae_onnx",  # ONNX Runtime, exported once
+}
+
+
+def load_videomae(path: str, engine: str = "torch"):
+    """Load a VideoMAE of that engine outside the registry, for worker processes"""
+    return LOADERS[VIDEOMAE_KINDS[engine]][0](path)
+
+
+class _Entry:
+    def __init__(self):
+        self.model = None
+        self.error = None
+        self.loaded = threading.Event()
+        self.lock = threading.RLock()  # Held while the model runs
+        self.last_used = time.monotonic()
+
+
+class ModelRegistry:
+    """Load each model once per process and share it between processors
+
+    Models are keyed by kind (see LOADERS) and absolute path, so a
+    camera restart or another video reuses what is already in memory.
+    Concurrent requests for a model that is still loading wait for that one
+    load. A shared model is not safe to run from two threads at once, so
+    callers run it inside `with models.lock(model):`. The lock belongs to the
+    model itself, so it keeps serializing callers after free() forgot it.
+
+    Before loading, models that sat unused for `idle_seconds` are dropped
+    when less than `min_available_mb` of memory is left.
+    """
+
+    def __init__(self, min_available_mb: int = 1024, idle_seconds: float = 60):
+        self.min_available_mb = min_available_mb
+        self.idle_seconds = idle_seconds
+        self.entries = {}  # (kind, path) -> _Entry
+        # Model -> its lock, for as long as anyone holds the model
+        self.model_locks = weakref.WeakKeyDictionary()
+        self.registry_lock = threading.Lock()
+
+    def get(self, kind: str, path: str):
+        """Return the shared model, loading it on first use"""
+        key = (kind, os.path.abspath(path))
+        with self.registry_lock:
+            entry = self.entries.get(key)
+            load = entry is None
+            if load:
+                entry = self.entries[key] = _Entry()
+
+        if load:
+            self.free_if_low_memory(keep=key)
+            try:
+                entry.model = LOADERS[kind][0](path)
+                with self.registry_lock:
+                    self.model_locks[entry.model] = entry.lock
+            except Exception as e:
+                entry.error = e
+                with self.registry_lock:
+                    # Let a later call try again
+                    self.entries.pop(key, None)
+            finally:
+                entry.loaded.set()
+        else:
+            entry.loaded.wait()
+
+        if entry.error is not None:
+            raise entry.error
+        entry.last_used = time.monotonic()
+        return entry.model
+
+    def lock(self, model):
+        """Lock to hold while running a model, a no-op for models not loaded here"""
+        with self.registry_lock:
+            for entry in self.entries.values():
+                if entry.model is model:
+                    entry.last_used = time.monotonic()
+                    break
+            lock = self.model_locks.get(model)
+        return lock if lock is not None else contextlib.nullcontext()
+
+    def warm_up(self, models):
+        """Load and run each (kind, path) once on a background thread"""
+
+        def run():
+            for kind, path in models:
+                try:
+                    model = self.get(kind, path)
+                    with self.lock(model):
+                        LOADERS[kind][1](model)
+                except Exception as e:
+                    print(f"Warm-up of {path} failed: {str(e)}")
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def free(self, kind: str = None, path: str = None, idle_seconds: float = 0):
+        """Forget models idle for idle_seconds, returning how many were dropped
+
+        Processors still holding a model keep it alive until they are done.
+        """
+        now = time.monotonic()
+        with self.registry_lock:
+            keys = [
+                key
+                for key, entry in self.entries.items()
+                if entry.loaded.is_set()
+                and (kind is None or key[0] == kind)
+                and (path is None or key[1] == os.path.abspath(path))
+                and now - entry.last_used >= idle_seconds
+            ]
+            for key in keys:
+                del self.entries[key]
+
+        # Hand cached GPU memory back, without importing torch just for that
+        torch = sys.modules.get("torch")
+        if keys and torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        return len(keys)
+
+    def free_if_low_memory(self, keep=None):
+        available = available_memory_mb()
+        if available is None or available >= self.min_available_mb:
+            return 0
+        with self.registry_lock:
+            keys = list(self.entries)
+        freed = 0
+        for key in keys:
+            if key != keep:
+                freed += self.free(*key, idle_seconds=self.idle_seconds)
+        return freed
+
+
+def available_memory_mb():
+    """Free system memory in MB, None when psutil is missing"""
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.virtual_memory().available / 2**20
+
+
+# Process-wide registry
+models = ModelRegistry()
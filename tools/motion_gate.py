@@ -0,0 +1,68 @@
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Decide whether a frame changed enough to be worth running detection on
+
+    Frames are shrunk to a small grayscale thumbnail and compared with the
+    thumbnail of the last frame that passed the gate, so slow changes still
+    add up until they pass. A frame passes when more than `min_changed` of
+    its thumbnail pixels moved by more than `pixel_threshold` gray levels,
+    and on every `refresh_every`-th frame so tracking never goes stale. Those
+    refreshes fall on fixed frame positions, so two runs over the same video
+    agree on which frames pass once they have both seen a refresh.
+    """
+
+    def __init__(
+        self,
+        size=(96, 54),
+        pixel_threshold: int = 15,
+        min_changed: float = 0.005,
+        refresh_every: int = 30,
+    ):
+        self.size = tuple(size)
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.refresh_every = refresh_every
+
+        self.reference = None  # Thumbnail of the last frame that passed
+        self.checked = 0
+        self.skipped = 0
+
+    @property
+    def settings(self):
+        """Parameters that change which frames pass, for cache keys"""
+        return (self.size, self.pixel_threshold, self.min_changed, self.refresh_every)
+
+    def thumbnail(self, frame):
+        """Small grayscale copy of a frame, safe to compute on any thread"""
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            # Channel order does not matter for spotting change
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small
+
+    def changed(self, thumbnail, position: int = None) -> bool:
+        """Return True when the frame should be processed, updating the reference
+
+        position is the frame's index in the stream, counted by the gate
+        itself when not given.
+        """
+        if position is None:
+            position = self.checked
+        self.checked += 1
+        if self.reference is not None and position % self.refresh_every:
+            diff = cv2.absdiff(thumbnail, self.reference)
+            moved = np.count_nonzero(diff > self.pixel_threshold)
+            if moved <= self.min_changed * diff.size:
+                self.skipped += 1
+                return False
+
+        self.reference = thumbnail
+        return True
+
+    def reset(self):
+        self.reference = None
+        self.checked = 0
+        self.skipped = 0
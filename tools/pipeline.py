@@ -0,0 +1,253 @@
+import threading
+from concurrent.futures import Future
+from queue import Empty, Full, Queue
+
+_STOP = object()  # End of stream marker passed between stages
+
+
+class PipelineCancelled(Exception):
+    pass
+
+
+class StageError:
+    """Exception raised inside a stage, carried downstream in place of a result"""
+
+    def __init__(self, stage: str, error: BaseException):
+        self.stage = stage
+        self.error = error
+
+
+class OrderedStage:
+    """Apply fn to queued items on several worker threads, keeping input order
+
+    Items travel as (seq, payload) pairs. Workers may finish out of order, but
+    each one waits for its turn before handing the result to the next queue,
+    so at most `workers` results are ever held back.
+    """
+
+    def __init__(self, name: str, fn, workers: int, in_queue: Queue, stop_event):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.in_queue = in_queue
+        self.out_queue = None
+        self.stop_event = stop_event
+
+        self._turn = threading.Condition()
+        self._next_seq = 0
+        self._alive = self.workers
+        self._threads = []
+
+    def start(self, out_queue: Queue):
+        self.out_queue = out_queue
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f"{self.name}-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _work(self):
+        try:
+            while True:
+                item = _get(self.in_queue, self.stop_event)
+                if item is _STOP:
+                    # Leave the marker for sibling workers
+                    _put(self.in_queue, _STOP, self.stop_event)
+                    break
+
+                seq, payload = item
+                if not isinstance(payload, StageError):
+                    try:
+                        payload = self.fn(payload)
+                    except Exception as e:
+                        payload = StageError(self.name, e)
+
+                with self._turn:
+                    while self._next_seq != seq:
+                        if self.stop_event.is_set():
+                            raise PipelineCancelled()
+                        self._turn.wait(0.1)
+                    _put(self.out_queue, (seq, payload), self.stop_event)
+                    self._next_seq += 1
+                    self._turn.notify_all()
+        except PipelineCancelled:
+            pass
+        finally:
+            with self._turn:
+                self._alive -= 1
+                last = self._alive == 0
+            if last:
+                try:
+                    _put(self.out_queue, _STOP, self.stop_event)
+                except PipelineCancelled:
+                    pass
+
+
+class StagedPipeline:
+    """Run a source iterator and a chain of stages on threads joined by bounded queues
+
+    `stages` is a list of (name, fn, workers), optionally followed by the size
+    of that stage's output queue. The source runs on its own thread, every
+    stage on `workers` threads, and iterating the pipeline yields the output
+    of the last stage in source order. Throughput is bounded by the slowest
+    stage instead of the sum of all of them.
+    """
+
+    def __init__(self, source, stages, queue_size: int = 8):
+        self.source = source
+        self.queue_size = queue_size
+        self.stop_event = threading.Event()
+
+        self._queues = [Queue(maxsize=queue_size)]
+        self._stages = []
+        for name, fn, workers, *out_size in stages:
+            stage = OrderedStage(name, fn, workers, self._queues[-1], self.stop_event)
+            self._queues.append(Queue(maxsize=out_size[0] if out_size else queue_size))
+            self._stages.append(stage)
+        self._source_thread = None
+        self._source_error = None
+
+    def __iter__(self):
+        self.start()
+        try:
+            while True:
+                item = _get(self._queues[-1], self.stop_event)
+                if item is _STOP:
+                    break
+                _, payload = item
+                if isinstance(payload, StageError):
+                    raise payload.error
+                yield payload
+            if self._source_error is not None:
+                raise self._source_error
+        except PipelineCancelled:
+            pass
+        finally:
+            self.close()
+
+    def start(self):
+        if self._source_thread is not None:
+            return
+        for stage, out_queue in zip(self._stages, self._queues[1:]):
+            stage.start(out_queue)
+        self._source_thread = threading.Thread(
+            target=self._feed, name="pipeline-source", daemon=True
+        )
+        self._source_thread.start()
+
+    def _feed(self):
+        iterator = iter(self.source)
+        try:
+            for seq, item in enumerate(iterator):
+                _put(self._queues[0], (seq, item), self.stop_event)
+            _put(self._queues[0], _STOP, self.stop_event)
+        except PipelineCancelled:
+            pass
+        except Exception as e:
+            self._source_error = e
+            try:
+                _put(self._queues[0], _STOP, self.stop_event)
+            except PipelineCancelled:
+                pass
+        finally:
+            # Let generator sources release their resources on this thread
+            if hasattr(iterator, "close"):
+                iterator.close()
+
+    def close(self):
+        """Stop all threads, dropping whatever is still queued"""
+        self.stop_event.set()
+        if self._source_thread is not None:
+            self._source_thread.join(1.0)
+        for stage in self._stages:
+            stage.join(1.0)
+
+
+class BatchWorker:
+    """Collect submitted items into batches and run fn over each batch
+
+    fn takes a list of items and returns a list of results in the same order.
+    Every worker thread blocks for one item and then takes whatever else is
+    already waiting, up to max_batch_size. It never waits for a batch to fill,
+    so a caller blocked on a result cannot stall the batcher.
+    """
+
+    def __init__(self, name: str, fn, max_batch_size: int = 4, workers: int = 1):
+        self.name = name
+        self.fn = fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.stop_event = threading.Event()
+        self.batch_sizes = []  # Size of every batch run, for monitoring
+
+        self._queue = Queue()
+        self._threads = []
+        for i in range(max(1, workers)):
+            thread = threading.Thread(
+                target=self._work, name=f"{name}-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, item) -> Future:
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _work(self):
+        while True:
+            try:
+                batch = [_get(self._queue, self.stop_event)]
+            except PipelineCancelled:
+                break
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except Empty:
+                    break
+
+            items = [item for item, _ in batch]
+            try:
+                results = self.fn(items)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batch_sizes.append(len(batch))
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def close(self):
+        self.stop_event.set()
+        for thread in self._threads:
+            thread.join(1.0)
+        # Fail anything still queued so no caller waits forever
+        while True:
+            try:
+                _, future = self._queue.get_nowait()
+            except Empty:
+                break
+            future.set_exception(PipelineCancelled())
+
+
+def _put(queue: Queue, item, stop_event):
+    while True:
+        try:
+            queue.put(item, timeout=0.1)
+            return
+        except Full:
+            if stop_event.is_set():
+                raise PipelineCancelled()
+
+
+def _get(queue: Queue, stop_event):
+    while True:
+        try:
+            return queue.get(timeout=0.1)
+        except Empty:
+            if stop_event.is_set():
+                raise PipelineCancelled()
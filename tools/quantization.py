@@ -0,0 +1,44 @@
+import os
+
+import torch
+from transformers import VideoMAEForVideoClassification
+
+from tools.result_cache import atomic_write, derived_model_path
+
+
+def quantize_dynamic(model):
+    """INT8 weights for every nn.Linear, activations are quantized on the fly
+
+    Nearly all of VideoMAE's compute is in the linear layers of its attention
+    and MLP blocks, so this is where INT8 pays off. Runs on CPU only.
+    """
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def load_quantized_videomae(model_path: str, cache_dir: str = None):
+    """Load the INT8 VideoMAE, quantizing and caching it on first use"""
+    path = derived_model_path(
+        model_path,
+        "int8",
+        ".pt",
+        cache_dir,
+        torch=torch.__version__,
+        engine=torch.backends.quantized.engine,
+    )
+    if os.path.exists(path):
+        try:
+            # A whole pickled module, which weights_only loading refuses
+            return torch.load(path, map_location="cpu", weights_only=False)
+        except Exception as e:
+            print(f"Ignoring unreadable quantized model {path}: {str(e)}")
+
+    model = VideoMAEForVideoClassification.from_pretrained(model_path).eval()
+    model = quantize_dynamic(model)
+    try:
+        with atomic_write(path) as temp_path:
+            torch.save(model, temp_path)
+    except OSError as e:
+        print(f"Could not cache quantized model at {path}: {str(e)}")
+    return model
@@ -0,0 +1,165 @@
+import contextlib
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from tools.detection import detection_dtype
+
+CACHE_VERSION = 2  # Bump when the layout or meaning of a stage changes
+
+
+def fast_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """Hash a file's size and its first, middle and last chunk
+
+    Reading three chunks keeps hashing a multi-GB video well under a second,
+    while still changing whenever the file is re-encoded or replaced. A
+    directory is hashed from the fast hashes of every file inside it.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                digest.update(os.path.relpath(file_path, path).encode())
+                digest.update(fast_hash(file_path, chunk_size).encode())
+        return digest.hexdigest()
+
+    size = os.path.getsize(path)
+    digest.update(str(size).encode())
+    offsets = {0, max(0, size // 2 - chunk_size // 2), max(0, size - chunk_size)}
+    with open(path, "rb") as f:
+        for offset in sorted(offsets):
+            f.seek(offset)
+            digest.update(f.read(chunk_size))
+    return digest.hexdigest()
+
+
+def model_fingerprint(path: str) -> str:
+    """Fingerprint model weights, falling back to the name for downloaded models"""
+    if os.path.exists(path):
+        return fast_hash(path)
+    return os.path.basename(path)
+
+
+def derived_model_path(
+    model_path: str, variant: str, suffix: str, cache_dir: str = None, **params
+) -> str:
+    """Where a converted copy of a model (quantized, exported) is cached
+
+    Copies live next to the model, in <model_path>-cache by default, rather
+    than inside it, so caching one does not change the model's fingerprint.
+    The name is keyed on that fingerprint and params, so new weights or a new
+    converter version produce a new copy.
+    """
+    cache_dir = cache_dir or os.path.normpath(model_path) + "-cache"
+    key = stage_key(model_fingerprint(model_path), variant=variant, **params)
+    return os.path.join(cache_dir, f"{variant}-{key}{suffix}")
+
+
+@contextlib.contextmanager
+def atomic_write(path: str):
+    """Yield a temporary path to write to, moved onto path once written
+
+    A crash never leaves a half-written file at path, and the temporary name
+    is per process, so workers writing the same file at once do not collide.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def stage_key(parent: str, **params) -> str:
+    """Derive a stage key from the previous stage's key and this stage's params"""
+    payload = json.dumps(
+        {"parent": parent, "version": CACHE_VERSION, **params},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class ResultCache:
+    """Per-stage processing results of one video, stored in a job workspace
+
+    Results live in <cache_dir>/<video hash>/<stage>-<key>.npz. Each stage key
+    is derived from the key of the stage before it, so changing a later stage
+    (for example the classifier) keeps the results of earlier ones usable.
+    """
+
+    def __init__(self, cache_dir: str, video_path: str):
+        self.video_hash = fast_hash(video_path)
+        self.root = os.path.join(cache_dir, self.video_hash)
+
+    def path(self, stage: str, key: str) -> str:
+        return os.path.join(self.root, f"{stage}-{key}.npz")
+
+    def load(self, stage: str, key: str):
+        """Return the stored arrays of a stage, or None when not cached"""
+        path = self.path(stage, key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                return {name: data[name] for name in data.files}
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable cache file {path}: {str(e)}")
+            return None
+
+    def save(self, stage: str, key: str, **arrays):
+        with atomic_write(self.path(stage, key)) as temp_path:
+            # Through a file object, so savez does not add .npz to the name
+            with open(temp_path, "wb") as f:
+                np.savez(f, **arrays)
+
+
+def pack_detections(boxes_per_frame, frame_indices):
+    """Flatten a list of per-frame detection records into arrays np.savez can store"""
+    counts = [len(boxes) for boxes in boxes_per_frame]
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    found = [boxes for boxes in boxes_per_frame if len(boxes)]
+    if found:
+        boxes = np.concatenate(found)
+    else:
+        boxes = np.zeros(0, dtype=detection_dtype())
+    return {
+        "boxes": boxes,
+        "offsets": offsets,
+        "frame_indices": np.asarray(frame_indices, dtype=np.int64),
+    }
+
+
+def unpack_detections(data):
+    boxes, offsets = data["boxes"], data["offsets"]
+    return [boxes[offsets[i] : offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+def pack_selections(selections):
+    """Store selected group centers as an (n, 2) array, -1 meaning no selection"""
+    packed = np.full((len(selections), 2), -1, dtype=np.int64)
+    for i, selected in enumerate(selections):
+        if selected:
+            packed[i] = selected
+    return {"centers": packed}
+
+
+def unpack_selections(data):
+    return [(int(x), int(y)) if x >= 0 else None for x, y in data["centers"].tolist()]
+
+
+def pack_predictions(predictions):
+    """Store (sample position, label) pairs for every classified clip"""
+    positions = np.array([position for position, _ in predictions], dtype=np.int64)
+    labels = np.array([label for _, label in predictions], dtype=np.str_)
+    return {"positions": positions, "labels": labels}
+
+
+def unpack_predictions(data):
+    return dict(zip(data["positions"].tolist(), data["labels"].tolist()))
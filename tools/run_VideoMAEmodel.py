@@ -8,27 +8,97 @@ from PIL import Image
 from torchvision import transforms
 from transformers import AutoProcessor, VideoMAEForVideoClassification
 
+from tools.clip_preprocessing import ClipPreprocessor
+from tools.quantization import load_quantized_videomae
+
 
 class RunVideoMAEmodel:
-    def __init__(self, model_path: str):
+    def __init__(
+        self,
+        model_path: str,
+        native_preprocessing: bool = True,
+        quantize: bool = False,
+        cache_dir: str = None,
+    ):
         self.model_path = model_path
+        self.quantize = quantize
         self.image_processor = AutoProcessor.from_pretrained(model_path)
-        self.VideoMAE_model = VideoMAEForVideoClassification.from_pretrained(model_path)
+        # Resize and normalise with OpenCV and numpy instead of PIL, when the
+        # processor settings allow it
+        self.clip_preprocessor = None
+        if native_preprocessing:
+            self.clip_preprocessor = ClipPreprocessor.from_image_processor(
+                self.image_processor
+            )
+        crop_size = self.image_processor.crop_size
+        self.crop_shape = (crop_size["height"], crop_size["width"], 3)
+        self.load_model(cache_dir)
 
-        # Move model to GPU if available
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.VideoMAE_model = self.VideoMAE_model.to(self.device)
+    def load_model(self, cache_dir: str = None):
+        """Set device, VideoMAE_model and config, engines override this"""
+        if self.quantize:
+            # Dynamic INT8 quantization only has CPU kernels. The quantized
+            # model is cached on disk, next to the original one
+            self.device = torch.device("cpu")
+            self.VideoMAE_model = load_quantized_videomae(self.model_path, cache_dir)
+        else:
+            self.VideoMAE_model = VideoMAEForVideoClassification.from_pretrained(
+                self.model_path
+            )
+            # Move model to GPU if available
+            self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+            self.VideoMAE_model = self.VideoMAE_model.to(self.device)
+        self.config = self.VideoMAE_model.config
 
     def transform(self, frames):
         """Transform frames for model input"""
         if len(frames) < 16:
-            # Pad with last frame if needed
+            # Pad with last frame if needed, leaving the caller's list alone
             last_frame = frames[-1]
-            frames.extend([last_frame] * (16 - len(frames)))
+            frames = list(frames) + [last_frame] * (16 - len(frames))
+
+        if self.clip_preprocessor is not None:
+            clip = self.clip_preprocessor(frames)
+            return torch.from_numpy(clip[None]).to(self.device)
 
         transformed = self.image_processor(frames, return_tensors="pt")
         return transformed["pixel_values"].to(self.device)
 
+    def crop_frame(self, frame, out=None):
+        """Resize and center crop one frame to the model input as (H, W, 3) uint8
+
+        The crop is written into out when given, such as a ClipScheduler slot.
+        """
+        if out is None:
+            out = np.empty(self.crop_shape, dtype=np.uint8)
+        if self.clip_preprocessor is not None:
+            self.clip_preprocessor.resize_crop(frame, out)
+        else:
+            transformed = self.image_processor(
+                [frame], do_rescale=False, do_normalize=False, return_tensors="np"
+            )
+            out[:] = transformed["pixel_values"][0, 0].transpose(1, 2, 0)
+        return out
+
+    def transform_batch(self, clips):
+        """Transform several clips into one batched model input
+
+        Kept for benchmarks/bench_videomae_batch.py, the pipelines go through
+        crop_frame and classify_crops.
+        """
+        padded = []
+        for frames in clips:
+            if len(frames) < 16:
+                frames = list(frames) + [frames[-1]] * (16 - len(frames))
+            padded.append(list(frames))
+
+        if self.clip_preprocessor is not None:
+            clips = np.stack([self.clip_preprocessor(frames) for frames in padded])
+            return torch.from_numpy(clips).to(self.device)
+
+        transformed = self.image_processor(padded, return_tensors="pt")
+        return transformed["pixel_values"].to(self.device)
+
     def run(self, tensor_frames):
         with torch.no_grad():
             outputs = self.VideoMAE_model(tensor_frames)
@@ -36,4 +106,32 @@ class RunVideoMAEmodel:
 
     def get_predict(self, logits):
         predicted_class_id = logits.argmax(-1).item()
-        return self.VideoMAE_model.config.id2label[predicted_class_id]
+        return self.config.id2label[predicted_class_id]
+
+    def get_predicts(self, logits):
+        """Return one label per row of batched logits"""
+        id2label = self.config.id2label
+        return [id2label[class_id] for class_id in logits.argmax(-1).tolist()]
+
+    def classify(self, clips):
+        """Classify N clips in one forward pass, returning N labels and logits
+
+        Takes full frames, used by benchmarks/bench_videomae_batch.py.
+        """
+        logits = self.run(self.transform_batch(clips))
+        return self.get_predicts(logits), logits
+
+    def classify_crops(self, clips):
+        """Classify N clips of frames that went through crop_frame"""
+        clips = np.stack(clips)
+        if self.clip_preprocessor is not None:
+            pixel_values = self.clip_preprocessor.normalize(clips)
+        else:
+            pixel_values = self.image_processor(
+                [list(clip) for clip in clips],
+                do_resize=False,
+                do_center_crop=False,
+                return_tensors="np",
+            )["pixel_values"]
+        logits = self.run(torch.from_numpy(pixel_values).to(self.device))
+        return self.get_predicts(logits), logits
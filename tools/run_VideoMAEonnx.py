@@ -0,0 +1,107 @@
+import os
+
+import onnxruntime as ort
+import torch
+from transformers import VideoMAEConfig, VideoMAEForVideoClassification
+
+from tools.result_cache import atomic_write, derived_model_path
+from tools.run_VideoMAEmodel import RunVideoMAEmodel
+
+ONNX_OPSET = 17
+
+
+def export_videomae_onnx(model_path: str, crop_shape, cache_dir: str = None):
+    """Path of the ONNX export of a VideoMAE, exporting it on first use
+
+    The export is cached next to the model, keyed on its fingerprint, the
+    torch version and the opset, so it only runs again when one changes.
+    The batch dimension stays dynamic for batched classification.
+    """
+    path = derived_model_path(
+        model_path,
+        "onnx",
+        ".onnx",
+        cache_dir,
+        torch=torch.__version__,
+        opset=ONNX_OPSET,
+    )
+    if os.path.exists(path):
+        return path
+
+    model = VideoMAEForVideoClassification.from_pretrained(model_path).eval()
+    model.config.return_dict = False  # Plain tuples trace cleanly
+    height, width, channels = crop_shape
+    pixel_values = torch.zeros(1, model.config.num_frames, channels, height, width)
+
+    with atomic_write(path) as temp_path, torch.no_grad():
+        torch.onnx.export(
+            model,
+            (pixel_values,),
+            temp_path,
+            input_names=["pixel_values"],
+            output_names=["logits"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=ONNX_OPSET,
+        )
+    return path
+
+
+class RunVideoMAEonnx(RunVideoMAEmodel):
+    """VideoMAE run by ONNX Runtime instead of PyTorch
+
+    Same interface as RunVideoMAEmodel: preprocessing is shared and run()
+    still takes and returns torch tensors, so processors switch engines by
+    configuration only. The PyTorch weights are only loaded to export them
+    once, after that the process holds just the ONNX Runtime session.
+
+    intra_op_threads defaults to torch's thread count, which batch workers
+    already split between themselves. VideoMAE is one long chain of layers,
+    so operators run sequentially on a single inter-op thread unless
+    inter_op_threads asks for more.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        native_preprocessing: bool = True,
+        cache_dir: str = None,
+        intra_op_threads: int = None,
+        inter_op_threads: int = 1,
+    ):
+        self.intra_op_threads = intra_op_threads or torch.get_num_threads()
+        self.inter_op_threads = inter_op_threads
+        super().__init__(model_path, native_preprocessing, cache_dir=cache_dir)
+
+    def load_model(self, cache_dir: str = None):
+        self.onnx_path = export_videomae_onnx(
+            self.model_path, self.crop_shape, cache_dir
+        )
+        self.config = VideoMAEConfig.from_pretrained(self.model_path)
+        self.VideoMAE_model = None
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.execution_mode = (
+            ort.ExecutionMode.ORT_PARALLEL
+            if self.inter_op_threads > 1
+            else ort.ExecutionMode.ORT_SEQUENTIAL
+        )
+        # Use the GPU when this onnxruntime build has it
+        available = ort.get_available_providers()
+        providers = [
+            provider
+            for provider in ("CUDAExecutionProvider", "CPUExecutionProvider")
+            if provider in available
+        ]
+        self.session = ort.InferenceSession(
+            self.onnx_path, options, providers=providers
+        )
+        # Inputs are handed over as numpy arrays, so tensors stay on the CPU
+        self.device = torch.device("cpu")
+
+    def run(self, tensor_frames):
+        pixel_values = tensor_frames.numpy()
+        (logits,) = self.session.run(["logits"], {"pixel_values": pixel_values})
+        return torch.from_numpy(logits)
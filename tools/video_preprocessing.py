@@ -1,86 +1,182 @@
+import os
+from concurrent.futures import Future
+
 import cv2
 import numpy as np
-from ultralytics import YOLO
+
+from tools.box_propagation import KeyframeDetector
+from tools.clip_scheduler import ClipScheduler
+from tools.detection import extract_detections, scale_detections
+from tools.frame_pool import FramePool
+from tools.grouping import attention_box, attention_crop, group_people
+from tools.model_registry import VIDEOMAE_KINDS, models
+from tools.motion_gate import MotionGate
+from tools.frame_sampler import FrameSampler
+from tools.pipeline import BatchWorker, StagedPipeline
+from tools.result_cache import (
+    ResultCache,
+    model_fingerprint,
+    pack_detections,
+    pack_predictions,
+    pack_selections,
+    stage_key,
+    unpack_detections,
+    unpack_predictions,
+    unpack_selections,
+)
+from tools.video_writer import AsyncVideoWriter
 
 
 class VideoPreprocessing:
-    def __init__(self, video_path: str, frame_size, fps: int, yolo_path: str):
+    def __init__(
+        self,
+        video_path: str,
+        frame_size,
+        fps: int,
+        yolo_path: str,
+        prepare_workers: int = 2,
+        classify_workers: int = 1,
+        max_batch_size: int = 4,
+        queue_size: int = 8,
+        clip_window: int = 16,
+        clip_stride: int = 16,
+        clip_step: int = 1,
+        videomae_path: str = "models/VideoMAE",
+        videomae_engine: str = "torch",
+        cache_dir: str = None,
+        motion_gate: bool = False,
+        detection_stride: int = 1,
+        detector_size=None,
+        crop_from_source: bool = False,
+        yolo=None,
+        videomae=None,
+    ):
         self.video_path = video_path
         self.fps = fps
-        self.yolo = YOLO(yolo_path)
+        self.yolo_path = yolo_path
+        self.videomae_path = videomae_path
+        # "torch", "int8" or "onnx", see VIDEOMAE_KINDS
+        self.videomae_engine = videomae_engine
+        # Already loaded models can be passed in to share them across videos
+        self._yolo = yolo
+        self.videomae = videomae
         self.frame_size = frame_size
+        # YOLO can run on a smaller image than frame_size, boxes are mapped back
+        self.detector_size = tuple(detector_size or frame_size)
+        # Take attention crops from the decoded frame instead of the resized one
+        self.crop_from_source = crop_from_source
         self.previous_center = None
         self.attention = 320
         self.selected_group = None
 
+        # Pipeline settings for iter_video
+        self.prepare_workers = prepare_workers
+        self.classify_workers = classify_workers
+        self.max_batch_size = max_batch_size
+        self.queue_size = queue_size
+
+        # Clip scheduling, a stride below the window gives overlapping clips
+        self.clip_window = clip_window
+        self.clip_stride = clip_stride
+        self.clip_step = clip_step
+
+        # Reused frame buffers, so the per-frame loop does not allocate frames
+        self.frame_pool = FramePool()
+
+        # Per-stage result cache, usually <job>/cache
+        self.cache_dir = cache_dir
+
+        # Optionally skip detection on frames that barely changed, reusing the
+        # last boxes, and run YOLO only every detection_stride frames, moving
+        # boxes between. The gate changes detections on static stretches, so
+        # it is off unless asked for
+        self.motion_gate = MotionGate() if motion_gate else None
+        self.detection_stride = detection_stride
+        self.keyframe_detector = KeyframeDetector(
+            self.detect_people, detection_stride, self.motion_gate
+        )
+
+    @property
+    def yolo(self):
+        # Loaded on first use so fully cached videos never load the detector,
+        # and shared with every other processor using the same weights
+        if self._yolo is None:
+            self._yolo = models.get("yolo", self.yolo_path)
+        return self._yolo
+
     def euclidean_distance(self, point1, point2):
         return np.sqrt((point1[0] - point2[0]) ** 2 + (point1[1] - point2[1]) ** 2)
 
     def group_people(self, centers, threshold=200):
-        n = len(centers)
-        groups = []
-        visited = [False] * n
-
-        for i in range(n):
-            if visited[i]:
-                continue
-
-            group = [i]
-            visited[i] = True
-
-            for j in range(i + 1, n):
-                if visited[j]:
-                    continue
-
-                if any(
-                    self.euclidean_distance(centers[k], centers[j]) < threshold
-                    for k in group
-                ):
-                    group.append(j)
-                    visited[j] = True
-
-            groups.append(group)
-
-        return groups
+        return group_people(centers, threshold)
 
     def process(self, frame):
-        person_boxes = []
-        centers = []
-
-        resized_frame = cv2.resize(frame, self.frame_size)
-        origin_frame = resized_frame.copy()  # Save the origin for attention
-        resized_frame = cv2.cvtColor(resized_frame, cv2.COLOR_BGR2RGB)
-
-        results = self.yolo.track(resized_frame, stream=True)
-
-        # print(f"1st Selected Group: {self.selected_group}")
-
-        for result in results:
-            classes_names = result.names
-            for box in result.boxes:
-                if box.conf[0] > 0.5:
-                    [x1, y1, x2, y2] = box.xyxy[0]
-                    x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-                    cls = int(box.cls[0])
-                    class_name = classes_names[cls]
-
-                    cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-                    person_boxes.append((x1, y1, x2, y2))
-                    centers.append((cx, cy))
-                    cv2.rectangle(resized_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    cv2.putText(
-                        resized_frame,
-                        f"{box.conf[0]:.2f}",
-                        (x1, y1),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        1,
-                        (0, 255, 0),
-                        2,
-                    )
-
+        return self.detect(*self.prepare(frame))
+
+    def prepare(self, frame):
+        """Resize a frame into pooled buffers, safe to run on several threads
+
+        Returns the frame_size image to draw on, the image attention crops
+        are cut from and the image YOLO runs on, all BGR like the decoded
+        frame. YOLO runs before anything is drawn, so it shares the first.
+        """
+        width, height = self.frame_size
+        shape = (height, width, 3)
+        resized_frame = cv2.resize(
+            frame, self.frame_size, dst=self.frame_pool.acquire(shape)
+        )
+        if self.crop_from_source:
+            origin_frame = frame
+        else:
+            # Left undrawn for attention crops
+            origin_frame = self.frame_pool.acquire(shape)
+            np.copyto(origin_frame, resized_frame)
+
+        detector_frame = resized_frame
+        if self.detector_size != tuple(self.frame_size):
+            width, height = self.detector_size
+            detector_frame = cv2.resize(
+                frame,
+                self.detector_size,
+                dst=self.frame_pool.acquire((height, width, 3)),
+                interpolation=cv2.INTER_AREA,
+            )
+        return resized_frame, origin_frame, detector_frame
+
+    def crop_source(self, frame):
+        """The image attention crops are cut from, for a decoded frame"""
+        if self.crop_from_source:
+            return frame
+        return cv2.resize(frame, self.frame_size)
+
+    def detect(self, resized_frame, origin_frame, detector_frame=None):
+        """Track people and select the attention area, frames must come in order"""
+        boxes = self.gated_detect(
+            resized_frame if detector_frame is None else detector_frame
+        )
+        selected_group = self.select_group(boxes)
+        return self.annotate_frame(resized_frame, origin_frame, boxes, selected_group)
+
+    def detect_people(self, detector_frame):
+        """Return the detection records of the people in a frame, in frame_size pixels"""
+        with models.lock(self.yolo):
+            results = self.yolo.track(detector_frame, stream=True)
+            detections = extract_detections(results)
+        height, width = detector_frame.shape[:2]
+        return scale_detections(detections, (width, height), self.frame_size)
+
+    def gated_detect(self, detector_frame, thumbnail=None, position=None):
+        """Detect people on keyframes that changed, reusing or moving boxes otherwise
+
+        Selecting a group again from the same detections keeps the current
+        selection, so callers can run select_group on every frame.
+        """
+        return self.keyframe_detector(detector_frame, thumbnail, position)
+
+    def select_group(self, boxes):
+        """Update and return the selected group center from this frame's boxes"""
+        centers = [tuple(center) for center in boxes["center"].tolist()]
         groups = self.group_people(centers)
-        attention_fr = None
-        # print(groups)
 
         for group in groups:
             if len(group) < 2:  # Minimum 2 people
@@ -98,134 +194,337 @@ class VideoPreprocessing:
 
             if self.previous_center:
                 prev_x, prev_y = self.previous_center
-                # print(
-                #     f"Previous: {prev_x, prev_y}, Current: {avg_center_x, avg_center_y}"
-                # )
                 if (
-                    # self.euclidean_distance(
-                    #     (avg_center_x, avg_center_y), (prev_x, prev_y)
-                    # )
-                    # > 30
-                    # or
                     self.euclidean_distance(
                         (avg_center_x, avg_center_y), (prev_x, prev_y)
                     )
                     < 5
                 ):
-                    # print("Keep the selected group")
+                    # Keep the selected group
                     self.selected_group = (prev_x, prev_y)
                     continue
-            # print("New attention group")
+            # New attention group
             self.previous_center = (avg_center_x, avg_center_y)
             self.selected_group = (avg_center_x, avg_center_y)
 
-        # print(f" 2nd Previous: {self.previous_center}, Selected: {self.selected_group}")
+        return self.selected_group
 
-        if self.selected_group:
-            avg_center_x, avg_center_y = self.selected_group
-            size = 320
-            half_size = size // 2
-            top_left_x = max(avg_center_x - half_size, 0)
-            top_left_y = max(avg_center_y - half_size, 0)
-            bottom_right_x = min(avg_center_x + half_size, frame.shape[1])
-            bottom_right_y = min(avg_center_y + half_size, frame.shape[0])
+    def annotate_frame(self, resized_frame, origin_frame, boxes, selected_group):
+        """Draw boxes and the attention area on the BGR frame, returning it and the crop"""
+        for (x1, y1, x2, y2), conf in zip(
+            boxes["box"].astype(np.int32).tolist(), boxes["conf"].tolist()
+        ):
+            cv2.rectangle(resized_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.putText(
+                resized_frame,
+                f"{conf:.2f}",
+                (x1, y1),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                1,
+                (0, 255, 0),
+                2,
+            )
+
+        attention_fr = None
+        if selected_group:
+            top_left_x, top_left_y, bottom_right_x, bottom_right_y = self.attention_box(
+                selected_group, resized_frame.shape
+            )
             cv2.rectangle(
                 resized_frame,
                 (top_left_x, top_left_y),
                 (bottom_right_x, bottom_right_y),
-                (255, 0, 0),
+                (0, 0, 255),
                 2,
             )
 
-            # resized_frame = cv2.cvtColor(resized_frame, cv2.COLOR_BGR2RGB)
-            attention_fr = origin_frame[
-                top_left_y:bottom_right_y, top_left_x:bottom_right_x
-            ]
-        resized_frame = cv2.cvtColor(resized_frame, cv2.COLOR_RGB2BGR)
+            attention_fr = self.attention_crop(origin_frame, selected_group)
         return resized_frame, attention_fr
 
-    def process_video(self):
-        cap = cv2.VideoCapture(self.video_path)
-        if not cap.isOpened():
-            raise ValueError(f"Error opening video file: {self.video_path}")
+    def attention_box(self, selected_group, frame_shape):
+        """Corners of the attention area around a group center, clipped to the frame"""
+        return attention_box(
+            selected_group, self.attention, (frame_shape[1], frame_shape[0])
+        )
+
+    def attention_crop(self, origin_frame, selected_group):
+        """Cut the attention area out of a crop source image of any resolution"""
+        return attention_crop(
+            origin_frame, selected_group, self.attention, self.frame_size
+        )
+
+    def cache_keys(self, video_hash):
+        """Keys of the detections, selections and predictions cache stages"""
+        detections = stage_key(
+            video_hash,
+            fps=self.fps,
+            frame_size=tuple(self.frame_size),
+            yolo=model_fingerprint(self.yolo_path),
+            motion_gate=self.motion_gate.settings if self.motion_gate else None,
+            detection_stride=self.detection_stride,
+            detector_size=self.detector_size,
+        )
+        selections = stage_key(detections, attention=self.attention)
+        predictions = stage_key(
+            selections,
+            clip=(self.clip_window, self.clip_stride, self.clip_step),
+            crop_from_source=self.crop_from_source,
+            videomae=model_fingerprint(self.videomae_path),
+            videomae_engine=self.videomae_engine,
+        )
+        return {
+            "detections": detections,
+            "selections": selections,
+            "predictions": predictions,
+        }
 
-        video_fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        sample_interval = max(1, int(video_fps / self.fps))
+    def iter_video(self, output_path: str = None):
+        """Yield processed frames one by one while the video is being read
+
+        Decoding, preparing, detection, clip scheduling and annotation run as
+        pipeline stages on their own threads, connected by bounded queues.
+        Clips are classified in batches of up to max_batch_size, so at most
+        that many clip strides worth of frames are held in memory at any time.
+
+        With an output_path, every yielded frame is also encoded into that
+        file by a background writer thread.
+
+        With a cache_dir, the results of each stage are stored once the whole
+        video is processed, and later runs reuse every stage whose inputs did
+        not change instead of running the models again.
+        """
+        sampler = FrameSampler(self.video_path, self.fps, pool=self.frame_pool)
+        self.keyframe_detector.reset()
+
+        # Load whatever earlier runs left, each stage builds on the one before
+        cache = keys = detections = selections = predictions = None
+        if self.cache_dir:
+            cache = ResultCache(self.cache_dir, self.video_path)
+            keys = self.cache_keys(cache.video_hash)
+            data = cache.load("detections", keys["detections"])
+            if data is not None:
+                detections = unpack_detections(data)
+                data = cache.load("selections", keys["selections"])
+                if data is not None:
+                    selections = unpack_selections(data)
+                    data = cache.load("predictions", keys["predictions"])
+                    if data is not None:
+                        predictions = unpack_predictions(data)
+        records = {
+            "frame_indices": [],
+            "detections": [],
+            "selections": [],
+            "predictions": [],
+        }
 
-        processed_frames = []
-        attention_frames = []
-        frame_indices = []  # Track which frames have attention
+        videomae = classifier = None
+        if predictions is None:
+            # Initialize VideoMAE model
+            videomae = self.videomae or models.get(
+                VIDEOMAE_KINDS[self.videomae_engine], self.videomae_path
+            )
+
+            def classify(clips):
+                with models.lock(videomae):
+                    return videomae.classify_crops(clips)[0]
+
+            classifier = BatchWorker(
+                "classify",
+                classify,
+                max_batch_size=self.max_batch_size,
+                workers=self.classify_workers,
+            )
+        scheduler = ClipScheduler(self.clip_window, self.clip_stride, self.clip_step)
+
+        position = 0  # Index of the sampled frame within the video
         current_prediction = None
-        frame_count = 0
-        current_idx = 0
-
-        # Initialize VideoMAE model
-        from tools.run_VideoMAEmodel import RunVideoMAEmodel
-
-        videomae = RunVideoMAEmodel("models/VideoMAE")
-
-        while cap.isOpened():
-            ret, frame = cap.read()
-            # original_size = frame.size
-            if not ret:
-                break
-
-            if frame_count % sample_interval == 0:
-                original_size = frame.shape
-                processed_frame, attention_frame = self.process(frame)
-
-                if attention_frame is not None:
-                    attention_frames.append(attention_frame)
-                    frame_indices.append(current_idx)
-
-                    # When we have 16 attention frames, process them
-                    if len(attention_frames) == 16:
-                        # Get prediction from VideoMAE
-                        tensor_frames = videomae.transform(attention_frames)
-                        logits = videomae.run(tensor_frames)
-                        new_prediction = videomae.get_predict(logits)
-
-                        # Update prediction if changed
-                        if new_prediction != current_prediction:
-                            current_prediction = new_prediction
-
-                        # Clear batch
-                        attention_frames = []
-                        frame_indices = []
-
-                # Draw current prediction if exists
-                if current_prediction:
-                    cv2.putText(
-                        processed_frame,
-                        f"Prediction: {current_prediction}",
-                        (50, 50),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        1,
-                        (0, 255, 0),
-                        2,
-                    )
 
-                processed_frames.append(
-                    cv2.resize(processed_frame, (original_size[1], original_size[0]))
+        def prepare(sample):
+            frame_index, _, frame = sample
+            resized_frame, origin_frame, detector_frame = self.prepare(frame)
+            if origin_frame is not frame:
+                self.frame_pool.release(frame)  # Back to the sampler
+            thumbnail = None
+            if self.motion_gate is not None and detections is None:
+                thumbnail = self.motion_gate.thumbnail(detector_frame)
+            return (
+                frame_index,
+                frame.shape,
+                resized_frame,
+                origin_frame,
+                detector_frame,
+                thumbnail,
+            )
+
+        def detect(prepared):
+            # Tracking and group selection keep state, so this stage is serial
+            nonlocal position
+            (
+                frame_index,
+                original_size,
+                resized_frame,
+                origin_frame,
+                detector_frame,
+                thumbnail,
+            ) = prepared
+            i = position
+            position += 1
+
+            if detections is None:
+                boxes = self.gated_detect(detector_frame, thumbnail, i)
+                records["frame_indices"].append(frame_index)
+                records["detections"].append(boxes)
+            else:
+                boxes = detections[i]
+            if detector_frame is not resized_frame:
+                self.frame_pool.release(detector_frame)
+
+            if selections is None:
+                selected_group = self.select_group(boxes)
+                records["selections"].append(selected_group)
+            else:
+                selected_group = selections[i]
+
+            processed_frame, attention_frame = self.annotate_frame(
+                resized_frame, origin_frame, boxes, selected_group
+            )
+            if predictions is not None:
+                attention_frame = None  # Clip predictions are cached, skip crops
+            return i, original_size, processed_frame, attention_frame, origin_frame
+
+        def transform(detected):
+            # Cut every attention frame down to the model input once, on several
+            # threads, so the scheduler only holds small uint8 crops
+            i, original_size, processed_frame, attention_frame, origin_frame = detected
+            if attention_frame is not None:
+                attention_frame = videomae.crop_frame(attention_frame)
+            # The crop is a copy, so the frame it was cut from is free again
+            self.frame_pool.release(origin_frame)
+            return i, original_size, processed_frame, attention_frame
+
+        def schedule(transformed):
+            i, original_size, processed_frame, attention_frame = transformed
+
+            prediction = None
+            if predictions is not None:
+                if i in predictions:
+                    prediction = Future()
+                    prediction.set_result(predictions[i])
+            elif attention_frame is not None:
+                # Queue a clip for VideoMAE whenever the scheduler cuts one
+                clip = scheduler.push(attention_frame)
+                if clip is not None:
+                    prediction = classifier.submit(clip)
+            return i, original_size, processed_frame, prediction
+
+        def annotate(scheduled):
+            nonlocal current_prediction
+            i, original_size, processed_frame, prediction = scheduled
+            if prediction is not None:
+                current_prediction = prediction.result()
+                if predictions is None:
+                    records["predictions"].append((i, current_prediction))
+
+            # Draw current prediction if exists
+            if current_prediction:
+                cv2.putText(
+                    processed_frame,
+                    f"Prediction: {current_prediction}",
+                    (50, 50),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    1,
+                    (0, 255, 0),
+                    2,
                 )
-                # if attention_frame is not None:
-                #     processed_frames.append(attention_frame)
-                current_idx += 1
 
-            frame_count += 1
+            frame = cv2.resize(processed_frame, (original_size[1], original_size[0]))
+            self.frame_pool.release(processed_frame)
+            return frame
+
+        # Frames wait in the annotate queue until their clip is classified, so
+        # it must hold enough frames for a full batch of clips to be ready
+        annotate_queue_size = max(
+            self.queue_size, self.clip_stride * self.max_batch_size
+        )
+        pipeline = StagedPipeline(
+            sampler,
+            [
+                ("prepare", prepare, self.prepare_workers),
+                ("detect", detect, 1),
+                ("transform", transform, self.prepare_workers),
+                ("schedule", schedule, 1, annotate_queue_size),
+                ("annotate", annotate, 1),
+            ],
+            queue_size=self.queue_size,
+        )
+        writer = None
+        if output_path:
+            writer = AsyncVideoWriter(output_path, min(self.fps, sampler.video_fps))
+
+        completed = False
+        try:
+            for frame in pipeline:
+                if writer is not None:
+                    writer.write(frame)
+                yield frame
+            completed = True
+        finally:
+            pipeline.close()
+            if classifier is not None:
+                classifier.close()
+            if writer is not None:
+                if completed:
+                    writer.close()
+                else:
+                    # Do not leave a truncated video behind in the job
+                    try:
+                        writer.close()
+                    except Exception:
+                        pass
+                    if os.path.exists(output_path):
+                        os.remove(output_path)
+
+        # Only a fully processed video is worth caching
+        if cache is not None:
+            if detections is None:
+                cache.save(
+                    "detections",
+                    keys["detections"],
+                    **pack_detections(records["detections"], records["frame_indices"]),
+                )
+            if selections is None:
+                cache.save(
+                    "selections",
+                    keys["selections"],
+                    **pack_selections(records["selections"]),
+                )
+            if predictions is None:
+                cache.save(
+                    "predictions",
+                    keys["predictions"],
+                    **pack_predictions(records["predictions"]),
+                )
 
-        # Process remaining attention frames if any
-        if attention_frames:
-            # Pad to 16 frames if needed
-            while len(attention_frames) < 16:
-                attention_frames.append(attention_frames[-1])
+    def sampled_frames(self):
+        """Number of frames iter_video will yield, 0 when unknown"""
+        sampler = FrameSampler(self.video_path, self.fps)
+        sampled_frames = sampler.sampled_frames
+        sampler.release()
+        return sampled_frames
 
-            tensor_frames = videomae.transform(attention_frames)
-            logits = videomae.run(tensor_frames)
-            current_prediction = videomae.get_predict(logits)
+    def output_fps(self):
+        """Frame rate of the frames iter_video yields, fps capped at the video's"""
+        sampler = FrameSampler(self.video_path, self.fps)
+        output_fps = sampler.fps
+        sampler.release()
+        return output_fps
+
+    def process_video(self):
+        sampler = FrameSampler(self.video_path, self.fps)
+        total_frames = sampler.total_frames
+        sampler.release()
 
-        cap.release()
+        processed_frames = list(self.iter_video())
 
         return {
             "processed_frames": processed_frames,
@@ -0,0 +1,76 @@
+import os
+import threading
+from queue import Queue
+
+import cv2
+
+
+class AsyncVideoWriter:
+    """Encode frames into a video file on a background thread
+
+    Frames are handed over through a bounded queue, so a slow encoder applies
+    backpressure instead of letting frames pile up in memory. The file is
+    opened on the first frame, once its size is known.
+    """
+
+    def __init__(
+        self, output_path: str, fps: float, fourcc: str = "mp4v", queue_size=32
+    ):
+        self.output_path = output_path
+        self.fps = fps
+        self.fourcc = fourcc
+        self.frames_written = 0
+        self.error = None
+
+        self._writer = None
+        self._queue = Queue(maxsize=queue_size)
+        self._thread = threading.Thread(
+            target=self._work, name="video-writer", daemon=True
+        )
+        self._thread.start()
+
+    def write(self, frame):
+        """Queue a BGR frame for encoding, blocking while the queue is full"""
+        if self.error is not None:
+            raise self.error
+        self._queue.put(frame)
+
+    def _open(self, frame):
+        os.makedirs(os.path.dirname(os.path.abspath(self.output_path)), exist_ok=True)
+        height, width = frame.shape[:2]
+        writer = cv2.VideoWriter(
+            self.output_path,
+            cv2.VideoWriter_fourcc(*self.fourcc),
+            self.fps,
+            (width, height),
+        )
+        if not writer.isOpened():
+            raise IOError(f"Error opening video writer: {self.output_path}")
+        return writer
+
+    def _work(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            if self.error is not None:
+                continue  # Keep draining so write() never blocks forever
+            try:
+                if self._writer is None:
+                    self._writer = self._open(frame)
+                self._writer.write(frame)
+                self.frames_written += 1
+            except Exception as e:
+                self.error = e
+
+        if self._writer is not None:
+            self._writer.release()
+
+    def close(self):
+        """Flush queued frames and finalise the file"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.output_path
@@ -0,0 +1,47 @@
+import cv2
+from PyQt5 import QtCore
+
+
+class CameraWorker(QtCore.QThread):
+    """Read, process and annotate camera frames on a background thread
+
+    Frames go to the GUI as RGB arrays through frameReady, so the GUI thread
+    only paints them. The capture keeps only the newest frame, so when
+    processing is slower than the camera the frames in between are dropped
+    instead of queueing up.
+    """
+
+    frameReady = QtCore.pyqtSignal(object)  # RGB frame
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, capture, processor=None, parent=None):
+        super().__init__(parent)
+        self.capture = capture
+        self.processor = processor
+        self._cancelled = False
+
+    def cancel(self):
+        """Ask the worker to stop after the current frame"""
+        self._cancelled = True
+
+    def run(self):
+        while not self._cancelled:
+            # Wake up now and then to notice cancel while the camera is quiet
+            ret, frame = self.capture.read(timeout=0.5)
+            if not ret:
+                if not self.capture.isOpened():
+                    break
+                continue
+
+            try:
+                if self.processor is not None:
+                    # Process frame with inference
+                    processed_frame = self.processor.update(frame)
+                else:
+                    # Just convert frame for display
+                    processed_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            except Exception as e:
+                self.failed.emit(str(e))
+                continue
+
+            self.frameReady.emit(processed_frame)
@@ -15,13 +15,16 @@ from PyQt5.QtWidgets import (
     QLabel,
     QLineEdit,
     QMessageBox,
+    QProgressBar,
     QPushButton,
     QSpinBox,
     QVBoxLayout,
     QWidget,
 )
 
+from tools.batch_processing import JOB_MOTION_GATE, inference_output_path
 from tools.video_preprocessing import VideoPreprocessing
+from views.processing_worker import ProcessingWorker
 from views.video_viewer import VideoViewer
 
 
@@ -29,7 +32,7 @@ class JobPanel(QFrame):
     # Add signal to communicate with main window
     videoSelected = QtCore.pyqtSignal(str)  # Signal to emit video path
     closed = QtCore.pyqtSignal()  # Add closed signal
-    processedVideoReady = QtCore.pyqtSignal(list, int)  # For processed frames
+    processedVideoReady = QtCore.pyqtSignal(object)  # ProcessingWorker to display
 
     def __init__(self, job_path: str):
         super().__init__()
@@ -68,19 +71,29 @@ class JobPanel(QFrame):
         self.modeComboBox = QComboBox()
         self.modelComboBox = QComboBox()
         self.sourceComboBox = QComboBox()
+        self.outputComboBox = QComboBox()
 
         # Add video control buttons
         self.showVideosBtn = QPushButton("Show Video")
         self.addVideoBtn = QPushButton("Add Videos")
         self.closeCameraBtn = QPushButton("Close Camera")  # Add close camera button
+        self.cancelBtn = QPushButton("Cancel")  # Stop background processing
 
-        # Initially disable close camera button
+        # Progress of background processing
+        self.progressBar = QProgressBar()
+        self.progressLabel = QLabel()
+        self.worker = None
+        self.closing = False  # Waiting for the worker to stop before closing
+
+        # Initially disable close camera and cancel buttons
         self.closeCameraBtn.setEnabled(False)
+        self.cancelBtn.setEnabled(False)
 
         # Setup combo boxes
         self.modeComboBox.addItems(["None", "Train", "Inference"])
         self.modelComboBox.addItems(["VideoMAE", "ViViT", "Pose+Transformer"])
         self.sourceComboBox.addItems(["Video", "Camera"])
+        self.outputComboBox.addItems(["Display", "Video File"])
 
         # Style all combo boxes
         combo_style = """
@@ -127,7 +140,12 @@ class JobPanel(QFrame):
         """
 
         # Apply style to all combo boxes
-        for combo in [self.modeComboBox, self.modelComboBox, self.sourceComboBox]:
+        for combo in [
+            self.modeComboBox,
+            self.modelComboBox,
+            self.sourceComboBox,
+            self.outputComboBox,
+        ]:
             combo.setStyleSheet(combo_style)
 
         # Style close button
@@ -390,7 +408,12 @@ class JobPanel(QFrame):
             if label != self.headerLabel:
                 label.setStyleSheet(form_label_style)
 
-        for combo in [self.modeComboBox, self.modelComboBox, self.sourceComboBox]:
+        for combo in [
+            self.modeComboBox,
+            self.modelComboBox,
+            self.sourceComboBox,
+            self.outputComboBox,
+        ]:
             combo.setStyleSheet(combo_style)
 
         for spinbox in [self.widthInput, self.heightInput, self.fpsInput]:
@@ -480,6 +503,7 @@ class JobPanel(QFrame):
         formLayout.addRow("Mode:", self.modeComboBox)
         formLayout.addRow("Model:", self.modelComboBox)
         formLayout.addRow("Source:", self.sourceComboBox)  # Move to bottom of form
+        formLayout.addRow("Output:", self.outputComboBox)
 
         videoSettingsGroup.setLayout(formLayout)
 
@@ -487,9 +511,42 @@ class JobPanel(QFrame):
         self.showVideosBtn.setStyleSheet(button_style)
         self.addVideoBtn.setStyleSheet(button_style)
         self.closeCameraBtn.setStyleSheet(close_camera_style)
+        self.cancelBtn.setStyleSheet(close_camera_style)
+
+        # Style progress widgets
+        self.progressBar.setStyleSheet(
+            """
+            QProgressBar {
+                font-size: 18px;
+                border: 2px solid #444;
+                border-radius: 8px;
+                background: #2A2A2A;
+                color: white;
+                text-align: center;
+                min-height: 30px;
+            }
+            QProgressBar::chunk {
+                background: #2196F3;
+                border-radius: 6px;
+            }
+            """
+        )
+        self.progressLabel.setStyleSheet(
+            """
+            QLabel {
+                font-size: 18px;
+                color: #BBBBBB;
+            }
+            """
+        )
 
         # Set icon sizes
-        for btn in [self.showVideosBtn, self.addVideoBtn, self.closeCameraBtn]:
+        for btn in [
+            self.showVideosBtn,
+            self.addVideoBtn,
+            self.closeCameraBtn,
+            self.cancelBtn,
+        ]:
             btn.setIconSize(QtCore.QSize(32, 32))
 
         # Create video control group box with same style
@@ -525,11 +582,21 @@ class JobPanel(QFrame):
         buttonLayout.addWidget(self.showVideosBtn)
         buttonLayout.addWidget(self.addVideoBtn)
         buttonLayout.addWidget(self.closeCameraBtn)
+        buttonLayout.addWidget(self.cancelBtn)
 
-        # Connect close camera button
+        # Connect close camera and cancel buttons
         self.closeCameraBtn.clicked.connect(self.closeCamera)
+        self.cancelBtn.clicked.connect(self.cancelProcessing)
 
-        videoControlGroup.setLayout(buttonLayout)
+        # Progress sits below the buttons, shown while processing
+        controlLayout = QVBoxLayout()
+        controlLayout.addLayout(buttonLayout)
+        controlLayout.addWidget(self.progressBar)
+        controlLayout.addWidget(self.progressLabel)
+        self.progressBar.hide()
+        self.progressLabel.hide()
+
+        videoControlGroup.setLayout(controlLayout)
 
         # Add all widgets to main layout
         mainLayout.addWidget(videoSettingsGroup)
@@ -540,7 +607,6 @@ class JobPanel(QFrame):
         # Connect buttons
         self.closeBtn.clicked.connect(self.closePanel)
         self.addVideoBtn.clicked.connect(self.addVideo)
-        self.showVideosBtn.clicked.connect(self.showVideos)
 
         self.setLayout(mainLayout)
         self.setFixedWidth(self.panel_width)
@@ -593,20 +659,17 @@ class JobPanel(QFrame):
                         frame_size=frame_size,
                         fps=fps,
                         yolo_path=self.yolo_path,
+                        cache_dir=os.path.join(self.job_path, "cache"),
+                        motion_gate=JOB_MOTION_GATE,
                     )
 
-                    # Process video
-                    frames_dict = video_processor.process_video()
-                    processed_frames = frames_dict["processed_frames"]
+                    output_path = None
+                    if self.outputComboBox.currentText() == "Video File":
+                        # Encode into the job and play it back with seeking
+                        output_path = inference_output_path(self.job_path, video_path)
 
-                    # Convert frames from BGR to RGB
-                    rgb_frames = []
-                    for frame in processed_frames:
-                        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                        rgb_frames.append(frame_rgb)
-
-                    # Emit signal with processed frames and fps
-                    self.processedVideoReady.emit(rgb_frames, fps)
+                    # Process on a background thread so the window stays responsive
+                    self.startProcessing(ProcessingWorker(video_processor, output_path))
 
                 except Exception as e:
                     QMessageBox.critical(
@@ -630,7 +693,72 @@ class JobPanel(QFrame):
                     f"camera://0?inference=true&fps={fps}&width={frame_size[0]}&height={frame_size[1]}"
                 )
 
+    def startProcessing(self, worker):
+        """Start a processing worker and follow its progress"""
+        self.worker = worker
+        worker.progressChanged.connect(self.onProgress)
+        worker.completed.connect(self.onProcessingCompleted)
+        worker.failed.connect(self.onProcessingFailed)
+        worker.finished.connect(self.onProcessingFinished)
+
+        self.showVideosBtn.setEnabled(False)
+        self.cancelBtn.setEnabled(True)
+        self.progressBar.setValue(0)
+        self.progressLabel.setText("Loading models...")
+        self.progressBar.show()
+        self.progressLabel.show()
+
+        # Let the main window connect the viewer before frames arrive
+        self.processedVideoReady.emit(worker)
+        worker.start()
+
+    def cancelProcessing(self):
+        if self.worker is not None:
+            self.cancelBtn.setEnabled(False)
+            self.progressLabel.setText("Cancelling...")
+            self.worker.cancel()
+
+    def onProgress(self, done, total, fps, eta):
+        """Show frames done, processing speed and time left"""
+        if total > 0:
+            self.progressBar.setMaximum(total)
+            self.progressBar.setValue(min(done, total))
+        else:
+            self.progressBar.setMaximum(0)  # Unknown length, busy indicator
+        eta_text = f"{int(eta) // 60}:{int(eta) % 60:02d}" if eta >= 0 else "-"
+        self.progressLabel.setText(
+            f"{done}/{total} frames, {fps:.1f} fps, ETA {eta_text}"
+        )
+
+    def onProcessingCompleted(self, output_path):
+        if output_path:
+            self.videoSelected.emit(output_path)
+
+    def onProcessingFailed(self, message):
+        QMessageBox.critical(
+            self,
+            "Error",
+            f"Error processing video: {message}",
+            QMessageBox.Ok,
+        )
+
+    def onProcessingFinished(self):
+        self.worker = None
+        self.showVideosBtn.setEnabled(True)
+        self.cancelBtn.setEnabled(False)
+        self.progressBar.hide()
+        self.progressLabel.hide()
+
     def closePanel(self):
+        # Stop background processing before the panel goes away, closing once
+        # the worker has finished instead of blocking the GUI until it does
+        if self.worker is not None:
+            if not self.closing:
+                self.closing = True
+                self.cancelProcessing()
+                self.worker.finished.connect(self.closePanel)
+            return
+
         # Create reverse animation
         self.closeAnimation = QPropertyAnimation(self, b"pos")
         self.closeAnimation.setDuration(300)
@@ -653,8 +781,8 @@ class JobPanel(QFrame):
 
     def onModeChanged(self, mode: str):
         """Handle mode selection change"""
-        # Enable show video button for all modes
-        self.showVideosBtn.setEnabled(True)
+        # Enable show video button for all modes, unless processing is running
+        self.showVideosBtn.setEnabled(self.worker is None)
 
         # Only disable add video button
         self.addVideoBtn.setEnabled(False)
@@ -0,0 +1,91 @@
+import time
+
+import cv2
+from PyQt5 import QtCore
+
+
+class ProcessingWorker(QtCore.QThread):
+    """Run VideoPreprocessing.iter_video on a background thread
+
+    Frames are handed to the GUI as RGB arrays through frameReady. Without an
+    output_path the video is shown at its sampled fps as it is processed. With one,
+    processing runs flat out into that file and only a preview frame is sent
+    every so often.
+    """
+
+    frameReady = QtCore.pyqtSignal(object)  # RGB frame
+    progressChanged = QtCore.pyqtSignal(int, int, float, float)  # done, total, fps, eta
+    completed = QtCore.pyqtSignal(str)  # Output path, empty when only displayed
+    failed = QtCore.pyqtSignal(str)
+    cancelled = QtCore.pyqtSignal()
+
+    def __init__(
+        self,
+        video_processor,
+        output_path: str = None,
+        preview_fps: int = 10,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.video_processor = video_processor
+        self.output_path = output_path
+        self.preview_fps = preview_fps
+        self._cancelled = False
+
+    def cancel(self):
+        """Ask the worker to stop after the current frame"""
+        self._cancelled = True
+
+    def run(self):
+        try:
+            total = self.video_processor.sampled_frames()
+            # Frames come at the requested fps, capped at the video's own
+            playback_fps = self.video_processor.output_fps()
+            frames = self.video_processor.iter_video(self.output_path)
+            start = last_frame = last_progress = time.monotonic()
+            playback_start = None
+            done = 0
+            try:
+                for frame in frames:
+                    if self._cancelled:
+                        break
+                    done += 1
+                    now = time.monotonic()
+
+                    if self.output_path is None:
+                        # Play back at the sampled fps, processing runs ahead.
+                        # The clock starts at the first frame, so model loading
+                        # is not made up for with a burst of frames
+                        if playback_start is None:
+                            playback_start = now
+                        delay = playback_start + (done - 1) / playback_fps - now
+                        if delay > 0:
+                            time.sleep(delay)
+                        # Nothing else holds the frame, so convert it in place
+                        self.frameReady.emit(
+                            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame)
+                        )
+                    elif now - last_frame >= 1 / self.preview_fps:
+                        last_frame = now
+                        self.frameReady.emit(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+                    if now - last_progress >= 0.25 or done == total:
+                        last_progress = now
+                        self.emitProgress(done, total, now - start)
+            finally:
+                # Stop the pipeline on this thread, removing a partial output
+                frames.close()
+
+            if self._cancelled:
+                self.cancelled.emit()
+                return
+            self.emitProgress(done, max(total, done), time.monotonic() - start)
+            self.completed.emit(self.output_path or "")
+
+        except Exception as e:
+            self.failed.emit(str(e))
+
+    def emitProgress(self, done, total, elapsed):
+        fps = done / elapsed if elapsed > 0 else 0.0
+        eta = (total - done) / fps if fps > 0 and total >= done else -1.0
+        self.progressChanged.emit(done, total, fps, eta)
@@ -1,14 +1,12 @@
 import os
 from typing import Optional
 
-import cv2
 from PyQt5 import QtCore, QtGui
 from PyQt5.QtCore import QRectF, QSize, QSizeF, Qt, QUrl
 from PyQt5.QtMultimedia import QMediaContent, QMediaPlayer
 from PyQt5.QtMultimediaWidgets import QGraphicsVideoItem, QVideoWidget
 from PyQt5.QtWidgets import (
     QAction,
-    QApplication,
     QGraphicsDropShadowEffect,
     QGraphicsScene,
     QGraphicsView,
@@ -21,6 +19,9 @@ from PyQt5.QtWidgets import (
     QWidget,
 )
 
+from tools.camera_capture import CameraCapture
+from views.camera_worker import CameraWorker
+
 
 class VideoViewer(QWidget):
     def __init__(self, video_path: str = None):
@@ -57,10 +58,14 @@ class VideoViewer(QWidget):
         """Load video file"""
         # Stop camera if running
         if hasattr(self, "cap") and self.is_camera_running:
-            self.cap.release()
-            self.timer.stop()
+            self.stopCameraWorker()
             self.is_camera_running = False
 
+        # Remove frames left over from showFrame so the video item is visible
+        if hasattr(self, "pixmap_item"):
+            self.scene.removeItem(self.pixmap_item)
+            del self.pixmap_item
+
         # Load video
         media = QMediaContent(QUrl.fromLocalFile(os.path.abspath(video_path)))
         self.mediaPlayer.setMedia(media)
@@ -348,60 +353,48 @@ class VideoViewer(QWidget):
         # Call original mouseReleaseEvent
         QSlider.mouseReleaseEvent(self.progressSlider, event)
 
-    def playFrames(self, frames, fps):
-        """Play a list of frames at specified fps"""
-        if not frames:
-            return
-
-        # Get initial frame size for consistent display
-        init_height, init_width = frames[0].shape[:2]
-
-        # Set scene size to match initial frame
-        self.scene.setSceneRect(0, 0, init_width, init_height)
-
-        for frame in frames:
-            # Convert numpy array to QImage
-            height, width, channel = frame.shape
-            bytes_per_line = 3 * width
-            q_img = QtGui.QImage(
-                frame.data,
-                width,
-                height,
-                bytes_per_line,
-                QtGui.QImage.Format_RGB888,
-            )
+    def showFrame(self, frame):
+        """Show one RGB frame in place of the previous one"""
+        # Stop a loaded video so the frame is not drawn over
+        if self.mediaPlayer.state() != QMediaPlayer.StoppedState:
+            self.mediaPlayer.stop()
 
-            # Convert to QPixmap
-            pixmap = QtGui.QPixmap.fromImage(q_img)
+        # Convert numpy array to QImage
+        height, width, channel = frame.shape
+        bytes_per_line = 3 * width
+        q_img = QtGui.QImage(
+            frame.data,
+            width,
+            height,
+            bytes_per_line,
+            QtGui.QImage.Format_RGB888,
+        )
 
-            # Create QGraphicsPixmapItem and add to scene
-            if hasattr(self, "pixmap_item"):
-                self.scene.removeItem(self.pixmap_item)
-            self.pixmap_item = self.scene.addPixmap(pixmap)
+        # Convert to QPixmap
+        pixmap = QtGui.QPixmap.fromImage(q_img)
 
-            # Center the pixmap in scene
-            self.pixmap_item.setPos(
-                (init_width - width) / 2, (init_height - height) / 2
-            )
+        # Create QGraphicsPixmapItem and add to scene
+        if hasattr(self, "pixmap_item"):
+            self.scene.removeItem(self.pixmap_item)
+        self.pixmap_item = self.scene.addPixmap(pixmap)
 
-            # Process events and add delay
-            QApplication.processEvents()
-            QtCore.QThread.msleep(int(1000 / fps))
+        # Set scene size to match the frame for consistent display
+        if self.scene.sceneRect() != QRectF(0, 0, width, height):
+            self.scene.setSceneRect(0, 0, width, height)
+            self.view.fitInView(self.pixmap_item, Qt.AspectRatioMode.KeepAspectRatio)
 
-    def loadCamera(self, fps, inference_mode=False, frame_size=(640, 480)):
-        """Load camera feed"""
+    def loadCamera(self, fps, inference_mode=False, frame_size=(640, 480), fourcc=None):
+        """Load camera feed, fourcc="MJPG" helps USB cameras reach their frame rate"""
         try:
             # Stop any playing video
             self.mediaPlayer.stop()
 
-            # Initialize camera
-            self.cap = cv2.VideoCapture(0)
+            # Initialize camera, read on its own thread so frames never queue up
+            self.cap = CameraCapture(0, fps=fps, fourcc=fourcc)
             if not self.cap.isOpened():
+                self.cap.release()
                 return False
 
-            # Set camera properties
-            self.cap.set(cv2.CAP_PROP_FPS, fps)
-
             # Initialize processor for inference mode
             if inference_mode:
                 from tools.camera_streaming_preprocessing import (
@@ -419,12 +412,14 @@ class VideoViewer(QWidget):
                     frame_size=frame_size,
                     fps=fps,
                     yolo_path=yolo_path,
+                    motion_gate=True,
                 )
 
-            # Create timer for frame updates
-            self.timer = QtCore.QTimer(self)
-            self.timer.timeout.connect(self.updateFrame)
-            self.timer.start(1000 // fps)
+            # Process frames on a worker thread, this one only paints them
+            self.cameraWorker = CameraWorker(self.cap, getattr(self, "processor", None))
+            self.cameraWorker.frameReady.connect(self.showFrame)
+            self.cameraWorker.failed.connect(self.cameraFailed)
+            self.cameraWorker.start()
 
             self.is_camera_running = True
             return True
@@ -433,59 +428,25 @@ class VideoViewer(QWidget):
             print(f"Camera error: {str(e)}")
             return False
 
-    def updateFrame(self):
-        """Update frame from camera"""
-        if not hasattr(self, "cap") or not self.cap.isOpened():
-            return
-
-        try:
-            ret, frame = self.cap.read()
-            if ret:
-                if hasattr(self, "processor"):
-                    # Process frame with inference
-                    processed_frame = self.processor.update(frame)
-                else:
-                    # Just convert frame for display
-                    processed_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-                height, width, channel = processed_frame.shape
-                bytes_per_line = 3 * width
-
-                # Convert to QImage
-                q_img = QtGui.QImage(
-                    processed_frame.data,
-                    width,
-                    height,
-                    bytes_per_line,
-                    QtGui.QImage.Format.Format_RGB888,
-                )
-
-                # Convert to QPixmap and display
-                pixmap = QtGui.QPixmap.fromImage(q_img)
+    def cameraFailed(self, message):
+        print(f"Frame update error: {message}")
 
-                # Update scene
-                if hasattr(self, "pixmap_item"):
-                    self.scene.removeItem(self.pixmap_item)
-                self.pixmap_item = self.scene.addPixmap(pixmap)
+    def stopCameraWorker(self):
+        """Stop the camera worker and then the capture it reads from"""
+        if hasattr(self, "cameraWorker"):
+            self.cameraWorker.cancel()
+            self.cameraWorker.wait()
+            del self.cameraWorker
 
-                # Fit frame to view
-                self.view.fitInView(
-                    self.pixmap_item, Qt.AspectRatioMode.KeepAspectRatio
-                )
-
-        except Exception as e:
-            print(f"Frame update error: {str(e)}")
+        if hasattr(self, "cap"):
+            self.cap.release()
+            print(f"Camera dropped {self.cap.dropped} of {self.cap.captured} frames")
 
     def stopCamera(self):
         """Stop camera and cleanup resources"""
         try:
-            # Stop timer first
-            if hasattr(self, "timer"):
-                self.timer.stop()
-
-            # Stop camera
-            if hasattr(self, "cap"):
-                self.cap.release()
+            # Stop the worker first, then the camera
+            self.stopCameraWorker()
 
             # Cleanup processor and thread if in inference mode
             if hasattr(self, "processor"):
@@ -496,6 +457,7 @@ class VideoViewer(QWidget):
             # Clear display
             if hasattr(self, "pixmap_item"):
                 self.scene.removeItem(self.pixmap_item)
+                del self.pixmap_item
 
             # Clear scene
             self.scene.clear()